@@ -0,0 +1,77 @@
+"""
+Throughput benchmark for BomCalculator.calculate_bom_batch
+
+Writes a synthetic corpus of random track files (JSON and .gtrk) to a
+temporary directory, then prices it serially and with a process pool and
+reports tracks per second for each. The results must match item for item.
+
+    python benchmarks/bench_batch.py --tracks 200 --pieces 800 -j 4
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import sys
+from pathlib import Path
+
+# The benchmarks live outside src/ so they aren't bundled with the app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from api import BomCalculator
+from random_tracks import random_track
+
+def write_corpus(directory, tracks, pieces, seed):
+    """Write `tracks` random track files, alternating JSON and .gtrk, and return their paths"""
+    rng = random.Random(seed)
+    paths = []
+    for index in range(tracks):
+        track = random_track(rng, pieces)
+        
+        if index % 2:
+            path = os.path.join(directory, f"track_{index}.gtrk")
+            with open(path, 'wb') as f:
+                f.write(track.to_bytes())
+        else:
+            path = os.path.join(directory, f"track_{index}.json")
+            with open(path, 'w') as f:
+                json.dump(track.to_dict(), f)
+        paths.append(path)
+    return paths
+
+def timed_batch(paths, max_workers, chunksize):
+    start = time.perf_counter()
+    results = list(BomCalculator.calculate_bom_batch(paths, max_workers=max_workers, chunksize=chunksize))
+    return time.perf_counter() - start, results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare serial and parallel batch pricing")
+    parser.add_argument("--tracks", type=int, default=200)
+    parser.add_argument("--pieces", type=int, default=800)
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, args.tracks, args.pieces, args.seed)
+        # Parallel first: forked workers would inherit the results the
+        # serial run memoizes, and the serial run doesn't see the workers'
+        parallel_seconds, parallel = timed_batch(paths, args.workers, args.chunksize)
+        serial_seconds, serial = timed_batch(paths, 1, args.chunksize)
+    
+    assert serial == parallel
+    assert all(result["status"] == "success" for result in serial)
+    
+    print(json.dumps({
+        "tracks": args.tracks,
+        "pieces_per_track": args.pieces,
+        "workers": args.workers,
+        "serial_tracks_per_second": round(args.tracks / serial_seconds, 1),
+        "parallel_tracks_per_second": round(args.tracks / parallel_seconds, 1),
+        "speedup": round(serial_seconds / parallel_seconds, 2)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Size and load time benchmark for the binary .gtrk track format
+
+Saves the same random track as JSON and as .gtrk and reports both file
+sizes and the time for a full read_track_file load of each, which includes
+building the occupancy map and the connection graph.
+
+    python benchmarks/bench_gtrk.py --pieces 100000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import sys
+from pathlib import Path
+
+# The benchmarks live outside src/ so they aren't bundled with the app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from persistence import read_track_file
+from random_tracks import random_track
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the JSON and .gtrk track formats")
+    parser.add_argument("--pieces", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    
+    track = random_track(random.Random(args.seed), args.pieces, width=100, depth=100, lane_width=2)
+    text = json.dumps(track.to_dict())
+    data = track.to_bytes()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "track.json")
+        gtrk_path = os.path.join(directory, "track.gtrk")
+        with open(json_path, 'w') as f:
+            f.write(text)
+        with open(gtrk_path, 'wb') as f:
+            f.write(data)
+        
+        assert read_track_file(gtrk_path).to_dict() == read_track_file(json_path).to_dict()
+        json_load = best_of(args.repeat, read_track_file, json_path)
+        gtrk_load = best_of(args.repeat, read_track_file, gtrk_path)
+    
+    print(json.dumps({
+        "pieces": len(track.store),
+        "size_mb": {"json": round(len(text) / 1e6, 2), "gtrk": round(len(data) / 1e6, 2)},
+        "load_seconds": {"json": round(json_load, 3), "gtrk": round(gtrk_load, 3)}
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
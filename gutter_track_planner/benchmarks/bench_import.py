@@ -0,0 +1,55 @@
+"""
+Import time benchmark for the core modules
+
+Imports the UI-free core modules in a fresh interpreter with
+python -X importtime and reports the best cumulative time over a few runs,
+leaving out what interpreter startup imports anyway. The README budget is
+50 ms; the test suite only checks which modules get imported, since wall
+clock times are too noisy to assert on.
+
+    python benchmarks/bench_import.py --repeat 5
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+CORE_MODULES = ("models", "api", "utils", "persistence")
+
+def import_times(statement):
+    """Map each top-level import python -X importtime reports to its cumulative microseconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # Unindented entries are top level; their times include everything below them
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$", line)
+        if match:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+def core_import_time():
+    """Microseconds spent importing the core modules, leaving out interpreter startup"""
+    startup = import_times("pass")
+    times = import_times("import " + ", ".join(CORE_MODULES))
+    return sum(micros for name, micros in times.items() if name not in startup)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time importing the core modules")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    
+    runs = [core_import_time() for _ in range(args.repeat)]
+    print(json.dumps({
+        "modules": list(CORE_MODULES),
+        "best_ms": round(min(runs) / 1000, 1),
+        "median_ms": round(sorted(runs)[len(runs) // 2] / 1000, 1)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Memory benchmark for Track
+
+Builds a track of horizontal straights, one per cell in row-major order,
+and reports the traced bytes per placed piece (store, occupancy planes,
+connection graph and the rest of the track's indexes).
+
+    python benchmarks/bench_memory.py --pieces 50000
+"""
+import argparse
+import json
+import math
+import time
+import tracemalloc
+import sys
+from pathlib import Path
+
+# The benchmarks live outside src/ so they aren't bundled with the app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from models import Track, Piece, PieceType
+
+def build_track(pieces, lane_width=6):
+    """Place `pieces` single-cell straights on a square board just big enough for them"""
+    side = math.isqrt(pieces - 1) + 1
+    track = Track(width=side * lane_width / 12, depth=side * lane_width / 12, lane_width=lane_width)
+    for index in range(pieces):
+        y, x = divmod(index, side)
+        track.add_piece(Piece(PieceType.STRAIGHT, x=x * lane_width, y=y * lane_width))
+    return track
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Track memory per piece")
+    parser.add_argument("--pieces", type=int, default=50000)
+    args = parser.parse_args(argv)
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    track = build_track(args.pieces)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(json.dumps({
+        "pieces": len(track.pieces),
+        "grid": [track.grid_width, track.grid_height],
+        "bytes_per_piece": round(current / args.pieces, 1),
+        "peak_bytes_per_piece": round(peak / args.pieces, 1),
+        "build_seconds": round(elapsed, 3)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
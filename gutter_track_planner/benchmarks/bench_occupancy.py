@@ -0,0 +1,88 @@
+"""
+Placement benchmark for the Track occupancy index
+
+Fills an event-sized board with random pieces, then times can_place_piece
+and piece_at_position against the old approach of walking every placed
+piece's cells, which is what each tap used to cost. The default 3 inch
+lanes give an 80x40 ft board room for 10,000 pieces; placement gives up
+after --attempts tries per piece, so an overfull board still finishes.
+
+    python benchmarks/bench_occupancy.py --width 80 --depth 40 --lane-width 3 --pieces 10000
+"""
+import argparse
+import json
+import random
+import time
+import sys
+from pathlib import Path
+
+# The benchmarks live outside src/ so they aren't bundled with the app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from random_tracks import random_piece, random_track
+
+def scan_can_place(track, piece):
+    """Placement check by walking every placed piece"""
+    cells = set(piece.get_occupied_cells(track.lane_width))
+    for cell_x, cell_y in cells:
+        if cell_x < 0 or cell_x >= track.grid_width or cell_y < 0 or cell_y >= track.grid_height:
+            return False
+    for other in track.pieces:
+        if cells.intersection(other.get_occupied_cells(track.lane_width)):
+            return False
+    return True
+
+def scan_piece_at(track, grid_x, grid_y):
+    """Hit test by walking every placed piece"""
+    for piece in track.pieces:
+        if (grid_x, grid_y) in piece.get_occupied_cells(track.lane_width):
+            return piece
+    return None
+
+def per_call(func, args):
+    start = time.perf_counter()
+    results = [func(*arg) for arg in args]
+    return (time.perf_counter() - start) / len(args), results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time placement checks with and without the occupancy index")
+    parser.add_argument("--width", type=float, default=80)
+    parser.add_argument("--depth", type=float, default=40)
+    parser.add_argument("--lane-width", type=float, default=3)
+    parser.add_argument("--pieces", type=int, default=10000)
+    parser.add_argument("--attempts", type=int, default=20,
+                        help="Placement tries per requested piece before giving up")
+    parser.add_argument("--checks", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    track = random_track(
+        rng, args.pieces, width=args.width, depth=args.depth,
+        lane_width=args.lane_width, attempts=args.attempts
+    )
+    build = time.perf_counter() - start
+    
+    candidates = [(track, random_piece(rng, track)) for _ in range(args.checks)]
+    taps = [(rng.randrange(track.grid_width), rng.randrange(track.grid_height)) for _ in range(args.checks)]
+    
+    indexed_place, indexed_fits = per_call(track.can_place_piece, [(piece,) for _, piece in candidates])
+    scan_place, scan_fits = per_call(scan_can_place, candidates)
+    indexed_tap, indexed_hits = per_call(track.piece_at_position, taps)
+    scan_tap, scan_hits = per_call(scan_piece_at, [(track, x, y) for x, y in taps])
+    
+    assert indexed_fits == scan_fits
+    assert [hit and hit.id for hit in indexed_hits] == [hit and hit.id for hit in scan_hits]
+    
+    print(json.dumps({
+        "pieces": len(track.store),
+        "requested_pieces": args.pieces,
+        "grid": [track.grid_width, track.grid_height],
+        "build_seconds": round(build, 3),
+        "can_place_us": {"indexed": round(indexed_place * 1e6, 2), "scan": round(scan_place * 1e6, 2)},
+        "piece_at_us": {"indexed": round(indexed_tap * 1e6, 2), "scan": round(scan_tap * 1e6, 2)}
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Time and memory benchmark for the streaming SVG export
+
+Builds a large random layout, then exports it to a temporary file and
+reports the export time, the SVG size, the peak memory traced during the
+export and how much the process's peak RSS grew while it ran.
+
+    python benchmarks/bench_svg.py --pieces 50000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+import sys
+from pathlib import Path
+
+# The benchmarks live outside src/ so they aren't bundled with the app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from random_tracks import random_track
+from utils import export_track_as_svg
+
+def max_rss_kb():
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the streaming SVG export")
+    parser.add_argument("--pieces", type=int, default=50000)
+    parser.add_argument("--side", type=int, default=1600, help="Board width and depth in cells")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    
+    rng = random.Random(args.seed)
+    track = random_track(rng, args.pieces, width=args.side / 2, depth=args.side / 2)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "track.svg")
+        
+        rss_before = max_rss_kb()
+        start = time.perf_counter()
+        export_track_as_svg(track, path)
+        elapsed = time.perf_counter() - start
+        rss_growth = max_rss_kb() - rss_before
+        size = os.path.getsize(path)
+        
+        # Traced separately, since tracing slows the export down
+        tracemalloc.start()
+        export_track_as_svg(track, path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    
+    print(json.dumps({
+        "pieces": len(track.store),
+        "grid": [track.grid_width, track.grid_height],
+        "export_seconds": round(elapsed, 3),
+        "svg_mb": round(size / 1e6, 2),
+        "peak_traced_kb": round(peak / 1024, 1),
+        "max_rss_growth_kb": rss_growth
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
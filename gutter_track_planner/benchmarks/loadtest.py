@@ -0,0 +1,175 @@
+"""
+Load test for the HTTP BOM service
+
+Starts the service in-process (or targets a running one with --url) and
+drives it with concurrent keep-alive clients posting tracks to /bom. While
+the load runs, a probe pings /health to show how responsive the event loop
+stays. Reports throughput, latency percentiles and the cache hit rate.
+
+    python benchmarks/loadtest.py --requests 2000 --concurrency 32 --distinct 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+import sys
+from pathlib import Path
+
+# The benchmarks live outside src/ so they aren't bundled with the app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from random_tracks import random_track
+from server import BomService
+
+class Client:
+    """A single keep-alive HTTP/1.1 connection"""
+    
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+    
+    async def request(self, method, path, body=b""):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await self.writer.drain()
+        
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        length = 0
+        for line in lines[1:]:
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        return status, await self.reader.readexactly(length)
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def run_load(host, port, requests, concurrency, bodies, seed):
+    rng = random.Random(seed)
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(rng.choice(bodies))
+    
+    latencies = []
+    failures = 0
+    probe_latencies = []
+    done = asyncio.Event()
+    
+    async def worker():
+        nonlocal failures
+        client = Client(host, port)
+        try:
+            while not queue.empty():
+                body = queue.get_nowait()
+                start = time.perf_counter()
+                status, response = await client.request("POST", "/bom", body)
+                latencies.append(time.perf_counter() - start)
+                if status != 200 or json.loads(response).get("status") != "success":
+                    failures += 1
+        finally:
+            client.close()
+    
+    async def probe():
+        client = Client(host, port)
+        try:
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.request("GET", "/health")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+        finally:
+            client.close()
+    
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+    
+    client = Client(host, port)
+    _, health = await client.request("GET", "/health")
+    client.close()
+    
+    latencies.sort()
+    probe_latencies.sort()
+    health = json.loads(health)
+    lookups = health["hits"] + health["misses"]
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2)
+        },
+        "health_probe_ms": {
+            "p50": round(percentile(probe_latencies, 0.50) * 1000, 2),
+            "max": round(probe_latencies[-1] * 1000, 2) if probe_latencies else 0.0
+        },
+        "cache_hit_rate": round(health["hits"] / lookups, 3) if lookups else 0.0
+    }
+
+async def main_async(args):
+    rng = random.Random(args.seed)
+    bodies = [
+        json.dumps(random_track(rng, args.pieces, attempts=4).to_dict()).encode()
+        for _ in range(args.distinct)
+    ]
+    
+    if args.url:
+        url = urlsplit(args.url)
+        return await run_load(url.hostname, url.port or 80, args.requests,
+                              args.concurrency, bodies, args.seed)
+    
+    # Run the service in this process on a free port
+    service = BomService(max_workers=args.workers, cache_size=args.cache_size)
+    started = asyncio.get_running_loop().create_future()
+    serve_task = asyncio.create_task(service.serve("127.0.0.1", 0, started.set_result))
+    server = await started
+    host, port = server.sockets[0].getsockname()[:2]
+    try:
+        return await run_load(host, port, args.requests, args.concurrency, bodies, args.seed)
+    finally:
+        serve_task.cancel()
+        try:
+            await serve_task
+        except asyncio.CancelledError:
+            pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the GutterTrack BOM service")
+    parser.add_argument("--url", help="Service to target (default: start one in-process)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=200,
+                        help="Distinct tracks to draw requests from")
+    parser.add_argument("--pieces", type=int, default=200,
+                        help="Pieces per generated track")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
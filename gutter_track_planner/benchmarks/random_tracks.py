@@ -0,0 +1,52 @@
+"""
+Random layouts shared by the benchmarks and the test suite
+"""
+from models import Track, Piece, PIECE_TYPES
+
+def random_piece(rng, track, max_length=4, off_grid=0.0):
+    """
+    Return an unplaced random piece somewhere on the track's board
+    
+    Args:
+        rng: random.Random to draw from
+        track: Track whose board the piece is placed on
+        max_length: Longest straight to draw
+        off_grid: Share of pieces put at arbitrary positions instead of on a grid cell
+    """
+    if off_grid and rng.random() < off_grid:
+        x = rng.uniform(0, track.width * 12)
+        y = rng.uniform(0, track.depth * 12)
+    else:
+        x = rng.randrange(track.grid_width) * track.lane_width
+        y = rng.randrange(track.grid_height) * track.lane_width
+    return Piece(
+        rng.choice(PIECE_TYPES),
+        x=x,
+        y=y,
+        rotation=rng.choice([0, 90, 180, 270]),
+        length=rng.randint(1, max_length)
+    )
+
+def random_track(rng, pieces, width=50, depth=50, lane_width=6, attempts=20, **piece_options):
+    """
+    Fill a board with up to `pieces` random pieces
+    
+    Placement gives up after `attempts` tries per requested piece, so a
+    board too small for `pieces` still returns, just with fewer of them.
+    
+    Args:
+        rng: random.Random to draw from
+        pieces: Pieces to place
+        width, depth, lane_width: Board dimensions (feet, feet, inches)
+        attempts: Tries per requested piece (1 makes `pieces` a number of tries)
+        piece_options: Passed on to random_piece
+    
+    Returns:
+        The filled Track
+    """
+    track = Track(width=width, depth=depth, lane_width=lane_width)
+    for _ in range(pieces * attempts):
+        if len(track.store) >= pieces:
+            break
+        track.add_piece(random_piece(rng, track, **piece_options))
+    return track
@@ -1,11 +1,199 @@
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+from collections import OrderedDict, deque
+from itertools import islice
 import json
-import flet as ft
-from models import Track, Piece, PieceType, BillOfMaterials
-from utils import calculate_materials_cost
+import os
+import time
+from models import Track, Piece, PieceType, BillOfMaterials, footprint, track_data_hash, MAX_STRAIGHT_LENGTH
+from utils import calculate_materials_cost, validate_dimensions, PRICE_TABLE_VERSION
+
+# Memoized (BOM, cost) results keyed by (layout hash, price table version)
+RESULT_CACHE_SIZE = 4096
+_result_cache = OrderedDict()
 
 # Since Flet 0.28.2 doesn't have ft.Canvas, we'll handle the BOM calculations directly
-# in the main app. But for a real-world app, we'd use FastAPI here.
+# in the main app. server.py exposes the same calculations over HTTP.
+
+class TrackValidator:
+    """
+    Single-pass track validator fed one piece at a time
+    
+    Checks the schema and allowed values of each piece, that it lies inside
+    the grid, and that it doesn't overlap pieces seen before it, using a bit
+    per grid cell. Memory depends on the grid size, not the piece count.
+    """
+    REQUIRED_FIELDS = ("width", "depth", "lane_width", "pieces")
+    PIECE_FIELDS = ("type", "x", "y", "rotation", "length")
+    VALID_TYPES = {piece_type.value: piece_type for piece_type in PieceType}
+    VALID_ROTATIONS = frozenset((0, 90, 180, 270))
+    
+    def __init__(self, max_errors=100):
+        self.max_errors = max_errors
+        self.errors = []
+        self.error_count = 0
+        self.pieces = 0
+        self.grid_width = 0
+        self.grid_height = 0
+        self.lane_width = None
+        self._occupied = None
+        self._status = "success"
+        self._started_at = time.perf_counter()
+    
+    def start(self, header):
+        """Check the track dimensions; returns False if pieces can't be validated"""
+        missing = False
+        for field in self.REQUIRED_FIELDS:
+            if field not in header:
+                self.error(f"Missing required field: {field}")
+                missing = True
+        if missing:
+            self._status = "error"
+            return False
+        
+        dimensions_valid = True
+        for field, label in (("width", "Width"), ("depth", "Depth"), ("lane_width", "Lane width")):
+            value = header[field]
+            if not _is_number(value):
+                self.error(f"{label} must be a number")
+                dimensions_valid = False
+            elif value <= 0:
+                self.error(f"{label} must be greater than zero")
+                dimensions_valid = False
+        
+        # The same limits the setup dialog and Track deserializers enforce
+        if dimensions_valid:
+            for message in validate_dimensions(header["width"], header["depth"], header["lane_width"]):
+                self.error(message)
+                dimensions_valid = False
+        
+        # Bounds and overlaps need a grid; schema checks still run without one
+        if dimensions_valid:
+            self.lane_width = header["lane_width"]
+            self.grid_width = int(header["width"] * 12 / self.lane_width)
+            self.grid_height = int(header["depth"] * 12 / self.lane_width)
+            self._occupied = bytearray((self.grid_width * self.grid_height + 7) // 8)
+        return True
+    
+    def add_piece(self, piece_data, place=True):
+        """
+        Validate the next piece
+        
+        Args:
+            piece_data: Piece data dictionary
+            place: False defers the bounds and overlap checks to place_piece()
+        """
+        self.pieces += 1
+        index = self.pieces
+        
+        piece_type, errors = self._check(index, piece_data)
+        for message in errors:
+            self.error(message)
+        
+        if not errors and place and self._occupied is not None:
+            self._place(index, piece_type, piece_data)
+    
+    def place_piece(self, index, piece_data):
+        """Run the deferred bounds and overlap checks for piece number `index`"""
+        # add_piece already reported any schema errors, but had no board to bound the length by
+        piece_type, errors = self._check(index, piece_data, board=False)
+        if errors or self._occupied is None:
+            return
+        message = self._check_length(index, piece_type, piece_data)
+        if message:
+            self.error(message)
+        else:
+            self._place(index, piece_type, piece_data)
+    
+    def _check(self, index, piece_data, board=True):
+        """
+        Check a piece's schema and allowed values; returns its type and any errors
+        
+        Once the dimensions are known (and board is True) a straight longer
+        than the board is refused here, before its cells are ever built.
+        """
+        if not isinstance(piece_data, dict):
+            return None, [f"Piece {index}: Expected an object"]
+        
+        # Check required piece fields
+        errors = []
+        for field in self.PIECE_FIELDS:
+            if field not in piece_data:
+                errors.append(f"Piece {index}: Missing required field: {field}")
+        
+        # Check piece type
+        piece_type = None
+        if "type" in piece_data:
+            piece_type = self.VALID_TYPES.get(piece_data["type"]) if isinstance(piece_data["type"], str) else None
+            if piece_type is None:
+                errors.append(f"Piece {index}: Invalid type: {piece_data['type']}")
+        
+        # Check rotation (a list or dict here isn't hashable, so check the type first)
+        if "rotation" in piece_data:
+            rotation = piece_data["rotation"]
+            if not _is_number(rotation) or rotation not in self.VALID_ROTATIONS:
+                errors.append(f"Piece {index}: Invalid rotation: {rotation}")
+        
+        for field in ("x", "y"):
+            if field in piece_data and not _is_number(piece_data[field]):
+                errors.append(f"Piece {index}: Invalid {field}: {piece_data[field]}")
+        
+        length = piece_data.get("length", 1)
+        if piece_type == PieceType.STRAIGHT and not (isinstance(length, int) and length >= 1):
+            errors.append(f"Piece {index}: Invalid length: {length}")
+        elif board and not errors and self._occupied is not None:
+            message = self._check_length(index, piece_type, piece_data)
+            if message:
+                errors.append(message)
+        
+        return piece_type, errors
+    
+    def _check_length(self, index, piece_type, piece_data):
+        """Return an error if a straight can't fit on the board at any position"""
+        length = piece_data["length"] if piece_type == PieceType.STRAIGHT else 1
+        if length > max(self.grid_width, self.grid_height):
+            return f"Piece {index}: Length {length} is longer than the board"
+        return None
+    
+    def _place(self, index, piece_type, piece_data):
+        """Check bounds and overlaps, then mark the piece's cells as taken"""
+        length = piece_data["length"] if piece_type == PieceType.STRAIGHT else 1
+        grid_x = int(piece_data["x"] / self.lane_width)
+        grid_y = int(piece_data["y"] / self.lane_width)
+        
+        bits = []
+        occupied = self._occupied
+        for dx, dy in footprint(piece_type, int(piece_data["rotation"]), length):
+            x = grid_x + dx
+            y = grid_y + dy
+            if x < 0 or x >= self.grid_width or y < 0 or y >= self.grid_height:
+                self.error(f"Piece {index}: Out of bounds at cell ({x}, {y})")
+                return
+            bit = y * self.grid_width + x
+            if occupied[bit >> 3] & (1 << (bit & 7)):
+                self.error(f"Piece {index}: Overlaps another piece at cell ({x}, {y})")
+                return
+            bits.append(bit)
+        
+        # Like Track.add_piece, rejected pieces don't take up cells
+        for bit in bits:
+            occupied[bit >> 3] |= 1 << (bit & 7)
+    
+    def error(self, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(message)
+    
+    def result(self):
+        elapsed = time.perf_counter() - self._started_at
+        return {
+            "status": self._status,
+            "valid": self.error_count == 0,
+            "errors": self.errors,
+            "error_count": self.error_count,
+            "truncated": self.error_count > len(self.errors),
+            "pieces": self.pieces,
+            "pieces_per_second": round(self.pieces / elapsed) if elapsed > 0 else 0
+        }
 
 class BomCalculator:
     """Simplified API-like calculator for bill of materials"""
@@ -22,15 +210,8 @@ class BomCalculator:
             Dictionary with BOM information
         """
         try:
-            # Create Track object from data
-            track = Track.from_dict(track_data)
-            
-            # Calculate BOM
-            bom = BillOfMaterials(track)
-            bom_data = bom.calculate()
-            
-            # Calculate cost estimate
-            cost_data = calculate_materials_cost(bom_data)
+            # Calculate BOM and cost estimate (memoized per layout)
+            bom_data, cost_data = _bom_and_cost(track_data)
             
             # Combine results
             result = {
@@ -47,106 +228,166 @@ class BomCalculator:
             }
     
     @staticmethod
-    def validate_track(track_data: Dict) -> Dict:
+    def calculate_bom_batch(
+        items: Iterable[Union[Dict, str, os.PathLike]],
+        max_workers: Optional[int] = None,
+        chunksize: int = 16
+    ) -> Iterator[Dict]:
+        """
+        Calculate bills of materials for many tracks in parallel
+        
+        Args:
+            items: Track data dictionaries and/or paths to track JSON or .gtrk files
+            max_workers: Worker processes to use (defaults to the CPU count, 1 runs serially)
+            chunksize: Tracks sent to a worker at a time
+            
+        Yields:
+            One calculate_bom result per item, in input order. A track that
+            can't be read or priced yields an error result without stopping
+            the batch.
+        """
+        yield from map_chunked(_calculate_bom_item, items, max_workers, chunksize)
+    
+    @staticmethod
+    def validate_track(track_data: Dict, max_errors: int = 100) -> Dict:
         """
         Validate track data
         
         Args:
             track_data: Track data dictionary
+            max_errors: Most error messages to report
             
         Returns:
             Dictionary with validation results
         """
-        errors = []
-        
         try:
-            # Check required fields
-            required_fields = ["width", "depth", "lane_width", "pieces"]
-            for field in required_fields:
-                if field not in track_data:
-                    errors.append(f"Missing required field: {field}")
+            validator = TrackValidator(max_errors)
             
-            # If any required fields are missing, return errors
-            if errors:
-                return {
-                    "status": "error",
-                    "valid": False,
-                    "errors": errors
-                }
-            
-            # Validate dimensions
-            if track_data["width"] <= 0:
-                errors.append("Width must be greater than zero")
-            
-            if track_data["depth"] <= 0:
-                errors.append("Depth must be greater than zero")
-            
-            if track_data["lane_width"] <= 0:
-                errors.append("Lane width must be greater than zero")
+            # Check required fields
+            if not validator.start(track_data):
+                return validator.result()
             
             # Validate pieces
-            for i, piece_data in enumerate(track_data["pieces"]):
-                # Check required piece fields
-                piece_fields = ["type", "x", "y", "rotation", "length"]
-                for field in piece_fields:
-                    if field not in piece_data:
-                        errors.append(f"Piece {i+1}: Missing required field: {field}")
-                
-                # Check piece type
-                if "type" in piece_data:
-                    valid_types = [
-                        "straight", "elbow_22_5", "elbow_45", 
-                        "elbow_90", "t_junction"
-                    ]
-                    if piece_data["type"] not in valid_types:
-                        errors.append(f"Piece {i+1}: Invalid type: {piece_data['type']}")
-                
-                # Check rotation
-                if "rotation" in piece_data:
-                    valid_rotations = [0, 90, 180, 270]
-                    if piece_data["rotation"] not in valid_rotations:
-                        errors.append(f"Piece {i+1}: Invalid rotation: {piece_data['rotation']}")
+            for piece_data in track_data["pieces"]:
+                validator.add_piece(piece_data)
             
-            # Return validation result
+            return validator.result()
+        except Exception as e:
             return {
-                "status": "success",
-                "valid": len(errors) == 0,
-                "errors": errors
+                "status": "error",
+                "valid": False,
+                "errors": [str(e)]
             }
+    
+    @staticmethod
+    def validate_file(path: Union[str, os.PathLike], max_errors: int = 100) -> Dict:
+        """
+        Validate a track file without loading it into memory
+        
+        Args:
+            path: Track JSON file, or NDJSON (.ndjson/.jsonl) with the
+                dimensions on the first line and one piece per line after
+            max_errors: Most error messages to report
+            
+        Returns:
+            Dictionary with validation results and throughput
+        """
+        validator = TrackValidator(max_errors)
+        try:
+            with open(path, 'r') as f:
+                is_ndjson = str(path).endswith(('.ndjson', '.jsonl'))
+                events = _iter_ndjson_track(f) if is_ndjson else _iter_json_track(f)
+                
+                # Pieces that arrive before the dimensions (say, keys written
+                # in sorted order) get their schema checked now; bounds and
+                # overlaps are checked in order on a second read of the file
+                header = {}
+                started = False
+                deferred = False
+                for kind, value in events:
+                    if kind == "piece":
+                        if started and not deferred:
+                            validator.add_piece(value)
+                        else:
+                            deferred = True
+                            validator.add_piece(value, place=False)
+                    elif kind == "field":
+                        header[value[0]] = value[1]
+                    elif kind == "pieces":
+                        header["pieces"] = []
+                    
+                    if not started and all(field in header for field in TrackValidator.REQUIRED_FIELDS):
+                        started = True
+                        if not validator.start(header):
+                            return validator.result()
                 
+                if not started:
+                    validator.start(header)
+                elif deferred:
+                    f.seek(0)
+                    events = _iter_ndjson_track(f) if is_ndjson else _iter_json_track(f)
+                    index = 0
+                    for kind, value in events:
+                        if kind == "piece":
+                            index += 1
+                            validator.place_piece(index, value)
         except Exception as e:
             return {
                 "status": "error",
                 "valid": False,
                 "errors": [str(e)]
             }
+        
+        return validator.result()
     
     @staticmethod
-    def optimize_track(track_data: Dict) -> Dict:
+    def optimize_track(track_data: Dict, max_length: Optional[int] = MAX_STRAIGHT_LENGTH) -> Dict:
         """
         Optimize track to minimize material usage
         
         Args:
             track_data: Track data dictionary
+            max_length: Longest straight (in grid units) the optimizer may create;
+                defaults to the longest straight sold, None allows any length
             
         Returns:
-            Dictionary with optimized track data
+            Dictionary with optimized track data and the BOM/cost change
         """
         try:
             # Create Track object from data
             track = Track.from_dict(track_data)
             
-            # In a real implementation, this would perform optimizations
-            # For example:
-            # 1. Combine adjacent straight pieces
-            # 2. Replace certain combinations of pieces with alternatives
-            # 3. Minimize the number of connectors
+            bom_before = BillOfMaterials(track).calculate()
+            cost_before = calculate_materials_cost(bom_before)
+            
+            # Opposite 22.5° bends cancel out, leaving a straight run
+            elbow_pairs = _replace_cancelling_elbows(track)
+            
+            # Collinear straights joined end to end become one longer straight
+            straights_merged = _merge_collinear_straights(track, max_length)
+            
+            bom_after = BillOfMaterials(track).calculate()
+            cost_after = calculate_materials_cost(bom_after)
             
-            # For now, just return the original track
             return {
                 "status": "success",
-                "message": "Track optimization not implemented",
-                "track": track_data
+                "message": (
+                    f"Replaced {elbow_pairs} elbow pairs and merged "
+                    f"{straights_merged} straights"
+                ),
+                "track": track.to_dict(),
+                "changes": {
+                    "elbow_pairs_replaced": elbow_pairs,
+                    "straights_merged": straights_merged
+                },
+                "bom": bom_after,
+                "cost": cost_after,
+                "bom_delta": {
+                    key: round(bom_after[key] - bom_before[key], 2) for key in bom_after
+                },
+                "cost_delta": {
+                    key: round(cost_after[key] - cost_before[key], 2) for key in cost_after
+                }
             }
         except Exception as e:
             return {
@@ -166,53 +407,443 @@ class BomCalculator:
             Dictionary with time estimate
         """
         try:
-            # Create Track object from data
-            track = Track.from_dict(track_data)
+            # Calculate BOM (memoized per layout)
+            bom_data, _ = _bom_and_cost(track_data)
             
-            # Calculate BOM
-            bom = BillOfMaterials(track)
-            bom_data = bom.calculate()
-            
-            # Simple time estimation based on number of pieces
-            # In a real implementation, this would be more sophisticated
-            
-            # Base time in minutes
-            base_time = 15
-            
-            # Time per straight foot (2 minutes per foot)
-            straight_time = bom_data["straight_feet"] * 2
-            
-            # Time per connection (3 minutes per connection)
-            connection_time = bom_data["connectors"] * 3
-            
-            # Time per elbow (additional 1 minute per elbow)
-            elbow_time = (
-                bom_data["elbows_22_5"] + 
-                bom_data["elbows_45"] + 
-                bom_data["elbows_90"]
-            ) * 1
+            return {
+                "status": "success",
+                "estimate": _assembly_estimate(bom_data)
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+    
+    @staticmethod
+    def check_lane_width(track_data: Dict, min_width: Optional[float] = None) -> Dict:
+        """
+        Find the places where a lane between two walls is too narrow
+        
+        Args:
+            track_data: Track data dictionary
+            min_width: Narrowest acceptable lane in inches (defaults to the lane width)
             
-            # Time per T-junction (additional 2 minutes per junction)
-            t_junction_time = bom_data["t_junctions"] * 2
+        Returns:
+            Dictionary with every pinch point found
+        """
+        try:
+            track = Track.from_dict(track_data)
+            pinch_points = track.find_pinch_points(min_width)
             
-            # Total time
-            total_minutes = base_time + straight_time + connection_time + elbow_time + t_junction_time
+            return {
+                "status": "success",
+                "min_width": track.lane_width if min_width is None else min_width,
+                "pinch_points": pinch_points,
+                "count": len(pinch_points)
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+    
+    @staticmethod
+    def analyze_track(track_data: Dict) -> Dict:
+        """
+        Validate a track and, if it is valid, price it and estimate its assembly
+        
+        Args:
+            track_data: Track data dictionary
             
-            # Convert to hours and minutes
-            hours = int(total_minutes // 60)
-            minutes = int(total_minutes % 60)
+        Returns:
+            Dictionary with validation, BOM, cost and assembly time estimate
+        """
+        validation = BomCalculator.validate_track(track_data)
+        if not validation["valid"]:
+            return {
+                "status": "error",
+                "validation": validation
+            }
+        
+        try:
+            # One BOM (memoized per layout) feeds all three results
+            bom_data, cost_data = _bom_and_cost(track_data)
             
             return {
                 "status": "success",
-                "estimate": {
-                    "total_minutes": total_minutes,
-                    "hours": hours,
-                    "minutes": minutes,
-                    "formatted": f"{hours}h {minutes}m" if hours > 0 else f"{minutes}m"
-                }
+                "validation": validation,
+                "bom": bom_data,
+                "cost": cost_data,
+                "estimate": _assembly_estimate(bom_data)
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "validation": validation,
+                "message": str(e)
             }
+
+def _bom_and_cost(track_data):
+    """
+    Return fresh (bom, cost) dictionaries for track data, reusing earlier results
+    
+    Results are memoized by the track's layout hash and the price table
+    version, so pricing the same layout again (in any piece order) skips
+    building the Track. Tracks where some pieces couldn't be placed aren't
+    memoized, since which overlapping piece wins depends on input order.
+    """
+    try:
+        key = (track_data_hash(track_data), PRICE_TABLE_VERSION)
+    except Exception:
+        # Malformed data; let Track.from_dict report the problem
+        key = None
+    
+    cached = _result_cache.get(key) if key is not None else None
+    if cached is not None:
+        _result_cache.move_to_end(key)
+    else:
+        track = Track.from_dict(track_data)
+        bom_data = BillOfMaterials(track).calculate()
+        cached = (bom_data, calculate_materials_cost(bom_data))
+        
+        if key is not None and len(track.store) == len(track_data["pieces"]):
+            _result_cache[key] = cached
+            if len(_result_cache) > RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+    
+    # Callers may modify what they get back
+    return dict(cached[0]), dict(cached[1])
+
+def _assembly_estimate(bom_data):
+    """Estimate assembly time from a bill of materials"""
+    # Simple time estimation based on number of pieces
+    # In a real implementation, this would be more sophisticated
+    
+    # Base time in minutes
+    base_time = 15
+    
+    # Time per straight foot (2 minutes per foot)
+    straight_time = bom_data["straight_feet"] * 2
+    
+    # Time per connection (3 minutes per connection)
+    connection_time = bom_data["connectors"] * 3
+    
+    # Time per elbow (additional 1 minute per elbow)
+    elbow_time = (
+        bom_data["elbows_22_5"] + 
+        bom_data["elbows_45"] + 
+        bom_data["elbows_90"]
+    ) * 1
+    
+    # Time per T-junction (additional 2 minutes per junction)
+    t_junction_time = bom_data["t_junctions"] * 2
+    
+    # Total time
+    total_minutes = base_time + straight_time + connection_time + elbow_time + t_junction_time
+    
+    # Convert to hours and minutes
+    hours = int(total_minutes // 60)
+    minutes = int(total_minutes % 60)
+    
+    return {
+        "total_minutes": total_minutes,
+        "hours": hours,
+        "minutes": minutes,
+        "formatted": f"{hours}h {minutes}m" if hours > 0 else f"{minutes}m"
+    }
+
+def _calculate_bom_item(item):
+    """Price one batch item, loading it first if it is a JSON or .gtrk file path"""
+    if isinstance(item, (str, os.PathLike)):
+        # Imported here to keep the core modules quick to import
+        from persistence import read_track_file, BINARY_TRACK_EXTENSION
+        
+        try:
+            if str(item).endswith(BINARY_TRACK_EXTENSION):
+                # Already a Track, so there's no track data to memoize by
+                bom_data = BillOfMaterials(read_track_file(item)).calculate()
+                return {
+                    "status": "success",
+                    "bom": bom_data,
+                    "cost": calculate_materials_cost(bom_data)
+                }
+            
+            with open(item, 'r') as f:
+                item = json.load(f)
         except Exception as e:
             return {
                 "status": "error",
                 "message": str(e)
-            }
\ No newline at end of file
+            }
+    
+    return BomCalculator.calculate_bom(item)
+
+def _apply_chunk(func, items):
+    return [func(item) for item in items]
+
+def map_chunked(func, items, max_workers=None, chunksize=16):
+    """
+    Apply func to every item across worker processes, yielding results in order
+    
+    Only a bounded number of chunks are in flight at once, so arbitrarily
+    long inputs stream through in constant memory. max_workers=1 runs serially.
+    Used by calculate_bom_batch and the command-line tool.
+    """
+    if max_workers == 1:
+        yield from map(func, items)
+        return
+    
+    # multiprocessing is slow to import, so only pay for it when used
+    from concurrent.futures import ProcessPoolExecutor
+    
+    max_workers = max_workers or os.cpu_count() or 1
+    items = iter(items)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Keep a bounded number of chunks in flight so huge inputs stream
+        max_pending = 2 * max_workers
+        pending = deque()
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(items, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_apply_chunk, func, chunk))
+            
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+def _is_horizontal(rotation):
+    return rotation % 360 in [0, 180]
+
+def _replace_cancelling_elbows(track):
+    """
+    Replace joined 22.5° elbows that bend in opposite directions with a straight
+    
+    On the grid a 22.5° elbow is a single cell with ports on opposite sides,
+    and elbows rotated 180° apart bend opposite ways, so a joined pair is
+    equivalent to a straight two cells long. Returns the number of pairs replaced.
+    """
+    store = track.store
+    connections = track.connections
+    replaced = 0
+    
+    for piece_id in store:
+        if piece_id not in store:
+            continue  # Already replaced as the partner of an earlier elbow
+        
+        piece_type, x, y, rotation, _ = store.row(piece_id)
+        if piece_type != PieceType.ELBOW_22_5:
+            continue
+        
+        for other_id, _ in connections.links(piece_id).values():
+            other_type, other_x, other_y, other_rotation, _ = store.row(other_id)
+            if other_type != PieceType.ELBOW_22_5 or (rotation - other_rotation) % 360 != 180:
+                continue
+            
+            straight = Piece(
+                PieceType.STRAIGHT,
+                x=min(x, other_x),
+                y=min(y, other_y),
+                rotation=0 if _is_horizontal(rotation) else 90,
+                length=2
+            )
+            track.remove_piece(store.piece(piece_id))
+            track.remove_piece(store.piece(other_id))
+            track.add_piece(straight)
+            replaced += 1
+            break
+    
+    return replaced
+
+def _merge_collinear_straights(track, max_length=MAX_STRAIGHT_LENGTH):
+    """
+    Merge chains of straights joined end to end along the same axis
+    
+    Straight port 0 is the west/north end and port 1 the east/south end, so
+    a chain is followed from its head through port 1 links that land on
+    port 0 of a straight with the same orientation. Returns the number of
+    pieces removed by merging.
+    """
+    store = track.store
+    connections = track.connections
+    merged = 0
+    
+    def next_in_chain(piece_id, horizontal):
+        link = connections.link(piece_id, 1)
+        if link is None or link[1] != 0:
+            return None
+        other_type, _, _, other_rotation, _ = store.row(link[0])
+        if other_type != PieceType.STRAIGHT or _is_horizontal(other_rotation) != horizontal:
+            return None
+        return link[0]
+    
+    for piece_id in store:
+        if piece_id not in store:
+            continue
+        
+        piece_type, x, y, rotation, _ = store.row(piece_id)
+        if piece_type != PieceType.STRAIGHT:
+            continue
+        
+        # Only start from the head of a chain
+        horizontal = _is_horizontal(rotation)
+        previous = connections.link(piece_id, 0)
+        if previous is not None and previous[1] == 1:
+            previous_type, _, _, previous_rotation, _ = store.row(previous[0])
+            if previous_type == PieceType.STRAIGHT and _is_horizontal(previous_rotation) == horizontal:
+                continue
+        
+        chain = [piece_id]
+        next_id = next_in_chain(piece_id, horizontal)
+        while next_id is not None:
+            chain.append(next_id)
+            next_id = next_in_chain(next_id, horizontal)
+        
+        if len(chain) == 1:
+            continue
+        
+        # Lay the chain back down as few straights as the length limit allows:
+        # full-length pieces with whatever is left over at the end
+        lengths = [store.row(chain_id)[4] for chain_id in chain]
+        total = sum(lengths)
+        if max_length is None:
+            segments = [(0, total)]
+        else:
+            segments = [
+                (offset, min(max_length, total - offset))
+                for offset in range(0, total, max_length)
+            ]
+        if len(segments) >= len(chain):
+            continue
+        
+        for chain_id in chain:
+            track.remove_piece(store.piece(chain_id))
+        
+        for offset, length in segments:
+            track.add_piece(Piece(
+                PieceType.STRAIGHT,
+                x=x + (offset * track.lane_width if horizontal else 0),
+                y=y + (0 if horizontal else offset * track.lane_width),
+                rotation=rotation,
+                length=length
+            ))
+        merged += len(chain) - len(segments)
+    
+    return merged
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _iter_ndjson_track(f):
+    """Yield track events from NDJSON: the dimensions line, then one piece per line"""
+    header_seen = False
+    for line in f:
+        if not line.strip():
+            continue
+        value = json.loads(line)
+        if not header_seen:
+            header_seen = True
+            for key, field_value in value.items():
+                if key == "pieces":
+                    # Tolerate a header carrying (some) pieces inline
+                    yield "pieces", None
+                    for piece_data in field_value:
+                        yield "piece", piece_data
+                else:
+                    yield "field", (key, field_value)
+            if "pieces" not in value:
+                yield "pieces", None
+        else:
+            yield "piece", value
+
+def _iter_json_track(f, chunk_size=1 << 16):
+    """
+    Yield track events from a track JSON object read incrementally
+    
+    Top-level fields are yielded as ("field", (key, value)), then the start
+    of the pieces array as ("pieces", None) and each element as ("piece",
+    value), so only one piece is held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+    
+    def next_char():
+        """Skip whitespace and return the next character without consuming it"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                raise ValueError("Unexpected end of track data")
+    
+    def expect(char):
+        nonlocal pos
+        if next_char() != char:
+            raise ValueError(f"Expected '{char}' at offset {pos}")
+        pos += 1
+    
+    def value():
+        """Decode the next complete value, reading more input as needed"""
+        nonlocal pos
+        next_char()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buffer, pos)
+                # A value ending the buffer (e.g. a number) might continue
+                if end < len(buffer) or eof:
+                    pos = end
+                    return result
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            if not fill():
+                result, pos = decoder.raw_decode(buffer, pos)
+                return result
+    
+    expect("{")
+    if next_char() == "}":
+        return
+    
+    while True:
+        key = value()
+        expect(":")
+        if key == "pieces" and next_char() == "[":
+            yield "pieces", None
+            pos += 1
+            if next_char() == "]":
+                pos += 1
+            else:
+                while True:
+                    yield "piece", value()
+                    separator = next_char()
+                    pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise ValueError(f"Expected ',' or ']' at offset {pos - 1}")
+        else:
+            yield "field", (key, value())
+        
+        separator = next_char()
+        pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or '}}' at offset {pos - 1}")
+
@@ -0,0 +1,104 @@
+"""
+Command-line batch tool for track files
+
+Validates, prices and estimates the assembly time of tracks without the UI,
+writing one JSON result per track (NDJSON) to stdout.
+
+    python cli.py tracks/ more.json        # Walk directories and files
+    cat tracks.ndjson | python cli.py -    # One track per line on stdin
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from api import BomCalculator, map_chunked
+from persistence import TRACK_FILE_EXTENSIONS, BINARY_TRACK_EXTENSION, read_track_file
+
+def iter_sources(paths, stdin=None):
+    """Yield track sources: file paths, or (line number, text) pairs read from stdin"""
+    for path in paths:
+        if path == "-":
+            for line_number, line in enumerate(stdin or sys.stdin, 1):
+                if line.strip():
+                    yield (line_number, line)
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                # Skip hidden directories like the storage index and autosaves
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for filename in sorted(files):
+                    if filename.endswith(TRACK_FILE_EXTENSIONS):
+                        yield os.path.join(root, filename)
+        else:
+            yield path
+
+def process_source(source):
+    """Load one track source and analyze it"""
+    if isinstance(source, tuple):
+        line_number, text = source
+        name = f"<stdin>:{line_number}"
+    else:
+        name = source
+    
+    try:
+        if isinstance(source, tuple):
+            track_data = json.loads(text)
+        elif source.endswith(BINARY_TRACK_EXTENSION):
+            track_data = read_track_file(source).to_dict()
+        else:
+            with open(source, 'r') as f:
+                track_data = json.load(f)
+        
+        result = BomCalculator.analyze_track(track_data)
+    except Exception as e:
+        result = {
+            "status": "error",
+            "message": str(e)
+        }
+    
+    return dict(source=name, **result)
+
+def main(argv=None, stdin=None, stdout=None):
+    parser = argparse.ArgumentParser(
+        description="Validate, price and estimate GutterTrack track files, writing NDJSON"
+    )
+    parser.add_argument(
+        "paths", nargs="*", default=["-"],
+        help="Track files or directories to walk; '-' reads NDJSON from stdin (default)"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None,
+        help="Worker processes (defaults to the CPU count, 1 runs serially)"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=64,
+        help="Tracks sent to a worker at a time"
+    )
+    args = parser.parse_args(argv)
+    stdout = stdout or sys.stdout
+    
+    processed = 0
+    failed = 0
+    start = time.perf_counter()
+    
+    results = map_chunked(
+        process_source, iter_sources(args.paths, stdin), args.workers, args.chunksize
+    )
+    for result in results:
+        processed += 1
+        if result["status"] != "success":
+            failed += 1
+        stdout.write(json.dumps(result) + "\n")
+    stdout.flush()
+    
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0
+    print(
+        f"{processed} tracks, {failed} failed, {elapsed:.2f}s ({rate:.0f} tracks/s)",
+        file=sys.stderr
+    )
+    
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
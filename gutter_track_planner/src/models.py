@@ -1,4 +1,16 @@
+import hashlib
+import heapq
+import math
+import re
+import struct
+import sys
+import time
+import weakref
+from array import array
+from bisect import bisect_right
 from enum import Enum
+from functools import lru_cache
+from itertools import compress
 
 class PieceType(Enum):
     STRAIGHT = "straight"
@@ -7,19 +19,243 @@ class PieceType(Enum):
     ELBOW_90 = "elbow_90"
     T_JUNCTION = "t_junction"
 
+# Compact integer codes used to store piece types in typed arrays
+PIECE_TYPES = list(PieceType)
+PIECE_TYPE_CODES = {piece_type: code for code, piece_type in enumerate(PIECE_TYPES)}
+STRAIGHT_CODE = PIECE_TYPE_CODES[PieceType.STRAIGHT]
+
+FOOTPRINT_CACHE_LENGTH = 64  # Longest straight whose footprint is kept in the cache
+
+def footprint(piece_type, rotation, length):
+    """
+    Return the cells a piece covers relative to its base cell
+    
+    The offsets only depend on type, rotation and length, so they are
+    computed once per combination and shared by every piece. Only lengths
+    up to FOOTPRINT_CACHE_LENGTH are cached, so a few absurdly long
+    straights can't pin huge tuples in memory; callers bound the length
+    against their grid before asking for its cells.
+    """
+    if length > FOOTPRINT_CACHE_LENGTH:
+        return _footprint.__wrapped__(piece_type, rotation, length)
+    return _footprint(piece_type, rotation, length)
+
+@lru_cache(maxsize=1024)
+def _footprint(piece_type, rotation, length):
+    # Rotations are compared modulo a full turn (450 is the same as 90)
+    rotation %= 360
+    
+    # Base cell
+    cells = [(0, 0)]
+    
+    # Additional cells based on piece type and rotation
+    if piece_type == PieceType.STRAIGHT:
+        # For straight pieces, add cells based on length and rotation
+        if rotation in [0, 180]:  # Horizontal
+            cells.extend((i, 0) for i in range(1, length))
+        else:  # Vertical (90, 270)
+            cells.extend((0, i) for i in range(1, length))
+    elif piece_type in [PieceType.ELBOW_45, PieceType.ELBOW_90]:
+        # For elbows, add one more cell based on rotation
+        if rotation == 0:  # Right and down
+            cells.append((1, 1))
+        elif rotation == 90:  # Left and down
+            cells.append((-1, 1))
+        elif rotation == 180:  # Left and up
+            cells.append((-1, -1))
+        elif rotation == 270:  # Right and up
+            cells.append((1, -1))
+    elif piece_type == PieceType.T_JUNCTION:
+        # T junction has three connecting points
+        if rotation == 0:  # T pointing down
+            cells.extend([(-1, 0), (1, 0), (0, 1)])
+        elif rotation == 90:  # T pointing left
+            cells.extend([(0, -1), (0, 1), (-1, 0)])
+        elif rotation == 180:  # T pointing up
+            cells.extend([(-1, 0), (1, 0), (0, -1)])
+        elif rotation == 270:  # T pointing right
+            cells.extend([(0, -1), (0, 1), (1, 0)])
+    
+    return tuple(cells)
+
+def _occupied_cells(piece_type, x, y, rotation, length, grid_size):
+    """Return the grid cells covered by a piece with the given geometry"""
+    grid_x = int(x / grid_size)
+    grid_y = int(y / grid_size)
+    return [(grid_x + dx, grid_y + dy) for dx, dy in footprint(piece_type, rotation, length)]
+
+# Directions as (dx, dy) unit steps, with y growing down the grid
+EAST = (1, 0)
+SOUTH = (0, 1)
+WEST = (-1, 0)
+NORTH = (0, -1)
+SOUTH_EAST = (1, 1)
+
+# Connection ports of each piece at rotation 0, as (cell offset, direction the open end faces).
+# Straights are handled separately because their ports depend on length.
+PIECE_PORTS = {
+    PieceType.ELBOW_22_5: (((0, 0), WEST), ((0, 0), EAST)),
+    PieceType.ELBOW_45: (((0, 0), WEST), ((1, 1), SOUTH_EAST)),
+    PieceType.ELBOW_90: (((0, 0), WEST), ((1, 1), SOUTH)),
+    PieceType.T_JUNCTION: (((-1, 0), WEST), ((1, 0), EAST), ((0, 1), SOUTH))
+}
+MAX_PORTS = 3  # Most ports on any piece (the T-junction)
+MAX_STRAIGHT_LENGTH = 5  # Longest straight sold, in grid units (the editor's length slider stops here too)
+MAX_STORED_LENGTH = 65535  # Longest length the piece store's unsigned 16-bit column holds
+
+def _rotate_clockwise(offset):
+    dx, dy = offset
+    return (-dy, dx)
+
+@lru_cache(maxsize=1024)
+def ports(piece_type, rotation, length):
+    """
+    Return the connection ports of a piece relative to its base cell
+    
+    Each port is (cell offset, direction) where direction is the unit step
+    from that cell towards whatever the port connects to.
+    """
+    rotation %= 360
+    
+    if piece_type == PieceType.STRAIGHT:
+        if rotation in [0, 180]:  # Horizontal
+            return (((0, 0), WEST), ((length - 1, 0), EAST))
+        return (((0, 0), NORTH), ((0, length - 1), SOUTH))
+    
+    if rotation not in [0, 90, 180, 270]:
+        return ()
+    
+    result = PIECE_PORTS[piece_type]
+    for _ in range(rotation // 90):
+        result = tuple(
+            (_rotate_clockwise(offset), _rotate_clockwise(direction))
+            for offset, direction in result
+        )
+    return result
+
+def _piece_ports(piece_type, x, y, rotation, length, grid_size):
+    """Return the absolute (cell, direction) ports of a piece with the given geometry"""
+    grid_x = int(x / grid_size)
+    grid_y = int(y / grid_size)
+    return [
+        ((grid_x + dx, grid_y + dy), direction)
+        for (dx, dy), direction in ports(piece_type, rotation, length)
+    ]
+
+# Short labels shown on the grid and in exports (straights add their length)
+PIECE_LABELS = {
+    PieceType.STRAIGHT: "S",
+    PieceType.ELBOW_22_5: "E22",
+    PieceType.ELBOW_45: "E45",
+    PieceType.ELBOW_90: "E90",
+    PieceType.T_JUNCTION: "T"
+}
+
+def piece_label(piece_type, length=1):
+    """Return the short label for a piece"""
+    if piece_type == PieceType.STRAIGHT:
+        return f"S {length}"
+    return PIECE_LABELS[piece_type]
+
+def layout_hash(width, depth, lane_width, pieces):
+    """
+    Return an order-independent content hash of a track layout
+    
+    pieces is an iterable of (type value, x, y, rotation, length). Pieces
+    are normalized the way the store keeps them (float positions, whole
+    rotations modulo 360, length 1 for anything but straights) and sorted,
+    so the same layout hashes the same however it was built or saved.
+    """
+    rows = sorted(
+        (
+            piece_type,
+            float(x),
+            float(y),
+            int(rotation) % 360,
+            int(length) if piece_type == PieceType.STRAIGHT.value else 1
+        )
+        for piece_type, x, y, rotation, length in pieces
+    )
+    digest = hashlib.sha256(repr((float(width), float(depth), float(lane_width))).encode())
+    digest.update(repr(rows).encode())
+    return digest.hexdigest()
+
+def track_data_hash(track_data):
+    """Return layout_hash for a track data dictionary without building the Track"""
+    return layout_hash(
+        track_data["width"],
+        track_data["depth"],
+        track_data["lane_width"],
+        (
+            (piece["type"], piece["x"], piece["y"], piece["rotation"], piece["length"])
+            for piece in track_data["pieces"]
+        )
+    )
+
+def _number(value):
+    """Return whole floats as ints, so saved positions read 6 rather than 6.0"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _piece_field(name):
+    """Property reading a piece field from its own slot or from the owning store"""
+    attr = "_" + name
+    
+    def getter(self):
+        store = self._store
+        if store is None:
+            return getattr(self, attr)
+        return store.get(self._id, name)
+    
+    def setter(self, value):
+        store = self._store
+        if store is None:
+            setattr(self, attr, value)
+        else:
+            store.set(self._id, name, value)
+    
+    return property(getter, setter)
+
 class Piece:
+    """
+    A single track piece
+    
+    A piece that hasn't been placed holds its own values. Once added to a
+    Track it becomes a thin view onto a row of the track's PieceStore.
+    """
+    __slots__ = ("_store", "_id", "_type", "_x", "_y", "_rotation", "_length", "__weakref__")
+    
     def __init__(self, piece_type, x=0, y=0, rotation=0, length=1):
-        self.type = piece_type
-        self.x = x
-        self.y = y
-        self.rotation = rotation  # In degrees (0, 90, 180, 270)
-        self.length = length if piece_type == PieceType.STRAIGHT else 1
+        self._store = None
+        self._id = None
+        self._type = piece_type
+        self._x = x
+        self._y = y
+        self._rotation = rotation  # In degrees (0, 90, 180, 270)
+        self._length = length if piece_type == PieceType.STRAIGHT else 1
+    
+    type = _piece_field("type")
+    x = _piece_field("x")
+    y = _piece_field("y")
+    rotation = _piece_field("rotation")
+    length = _piece_field("length")
+    
+    @property
+    def id(self):
+        """Stable integer id of the piece while it is placed on a track"""
+        return self._id
+    
+    @property
+    def label(self):
+        """Short label for the piece (e.g. "S 3" or "E90")"""
+        return piece_label(self.type, self.length)
     
     def to_dict(self):
         return {
             "type": self.type.value,
-            "x": self.x,
-            "y": self.y,
+            "x": _number(self.x),
+            "y": _number(self.y),
             "rotation": self.rotation,
             "length": self.length
         }
@@ -35,85 +271,730 @@ class Piece:
         )
         
     def rotate(self, degrees=90):
-        """Rotate the piece by specified degrees clockwise"""
-        self.rotation = (self.rotation + degrees) % 360
+        """
+        Rotate the piece by specified degrees clockwise
+        
+        A placed piece is only rotated if it still fits on its track.
+        Returns True if the rotation was applied.
+        """
+        rotation = (self.rotation + degrees) % 360
+        store = self._store
+        if store is not None and store.owner is not None:
+            return store.owner.update_piece(self, rotation=rotation)
+        self.rotation = rotation
+        return True
         
     def get_occupied_cells(self, grid_size):
-        """Return list of grid cells this piece occupies"""
-        cells = []
-        grid_x = int(self.x / grid_size)
-        grid_y = int(self.y / grid_size)
-        
-        # Base cell
-        cells.append((grid_x, grid_y))
-        
-        # Additional cells based on piece type and rotation
-        if self.type == PieceType.STRAIGHT:
-            # For straight pieces, add cells based on length and rotation
-            if self.rotation in [0, 180]:  # Horizontal
-                for i in range(1, self.length):
-                    cells.append((grid_x + i, grid_y))
-            else:  # Vertical (90, 270)
-                for i in range(1, self.length):
-                    cells.append((grid_x, grid_y + i))
-        elif self.type in [PieceType.ELBOW_45, PieceType.ELBOW_90]:
-            # For elbows, add one more cell based on rotation
-            if self.rotation == 0:  # Right and down
-                cells.append((grid_x + 1, grid_y + 1))
-            elif self.rotation == 90:  # Left and down
-                cells.append((grid_x - 1, grid_y + 1))
-            elif self.rotation == 180:  # Left and up
-                cells.append((grid_x - 1, grid_y - 1))
-            elif self.rotation == 270:  # Right and up
-                cells.append((grid_x + 1, grid_y - 1))
-        elif self.type == PieceType.T_JUNCTION:
-            # T junction has three connecting points
-            if self.rotation == 0:  # T pointing down
-                cells.extend([(grid_x - 1, grid_y), (grid_x + 1, grid_y), (grid_x, grid_y + 1)])
-            elif self.rotation == 90:  # T pointing left
-                cells.extend([(grid_x, grid_y - 1), (grid_x, grid_y + 1), (grid_x - 1, grid_y)])
-            elif self.rotation == 180:  # T pointing up
-                cells.extend([(grid_x - 1, grid_y), (grid_x + 1, grid_y), (grid_x, grid_y - 1)])
-            elif self.rotation == 270:  # T pointing right
-                cells.extend([(grid_x, grid_y - 1), (grid_x, grid_y + 1), (grid_x + 1, grid_y)])
+        """Return the grid cells this piece occupies"""
+        store = self._store
+        if store is not None and store.owner is not None and store.owner.lane_width == grid_size:
+            # Placed pieces reuse the footprint cached by their track
+            return store.owner._piece_cells(self._id)
+        return _occupied_cells(self.type, self.x, self.y, self.rotation, self.length, grid_size)
+    
+    def get_ports(self, grid_size):
+        """Return the (cell, direction) connection ports of this piece"""
+        return _piece_ports(self.type, self.x, self.y, self.rotation, self.length, grid_size)
+
+class PieceStore:
+    """
+    Columnar storage for the pieces of a track
+    
+    Each field lives in its own typed array indexed by slot. Pieces are
+    addressed by stable integer ids; removing a piece moves the last row
+    into the freed slot so removal is O(1) and the columns stay dense.
+    """
+    FIELDS = ("type", "x", "y", "rotation", "length")
+    
+    def __init__(self, owner=None):
+        self.owner = owner  # Track notified before and after a piece changes
+        self.types = array("B")
+        self.xs = array("d")
+        self.ys = array("d")
+        self.rotations = array("h")
+        self.lengths = array("H")
+        self.ids = array("q")  # Slot -> piece id
+        self._slots = array("q")  # Piece id -> slot, -1 once removed
+        self._columns = {
+            "type": self.types,
+            "x": self.xs,
+            "y": self.ys,
+            "rotation": self.rotations,
+            "length": self.lengths
+        }
+        self._views = weakref.WeakValueDictionary()
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __iter__(self):
+        """Iterate over piece ids (a snapshot, so the store may change meanwhile)"""
+        return iter(self.ids.tolist())
+    
+    def __contains__(self, piece_id):
+        return 0 <= piece_id < len(self._slots) and self._slots[piece_id] >= 0
+    
+    @staticmethod
+    def _column_value(name, value):
+        """
+        Convert a field value to what its column stores
+        
+        Raises ValueError for values the typed column can't hold, so callers
+        can convert everything before they touch any column.
+        """
+        if name == "type":
+            return PIECE_TYPE_CODES[PieceType(value)]
+        if name in ("x", "y"):
+            return float(value)
+        value = int(value)
+        if name == "rotation":
+            # Rotations are stored modulo a full turn so any angle fits the column
+            return value % 360
+        if not 1 <= value <= MAX_STORED_LENGTH:
+            raise ValueError(f"Piece length must be between 1 and {MAX_STORED_LENGTH}, got {value}")
+        return value
+    
+    def add(self, piece_type, x, y, rotation, length):
+        """Append a row and return the new piece id"""
+        row = [
+            self._column_value(name, value)
+            for name, value in zip(self.FIELDS, (piece_type, x, y, rotation, length))
+        ]
+        
+        piece_id = len(self._slots)
+        self._slots.append(len(self.ids))
+        self.ids.append(piece_id)
+        for column, value in zip(self._columns.values(), row):
+            column.append(value)
+        return piece_id
+    
+    def remove(self, piece_id):
+        """Remove a row by moving the last row into its slot"""
+        # Hand the values back to a live view so the piece outlives removal
+        view = self._views.pop(piece_id, None)
+        if view is not None:
+            (view._type, view._x, view._y,
+             view._rotation, view._length) = self.row(piece_id)
+            view._store = None
+            view._id = None
+        
+        slot = self._slots[piece_id]
+        last = len(self.ids) - 1
+        if slot != last:
+            for column in self._columns.values():
+                column[slot] = column[last]
+            moved_id = self.ids[last]
+            self.ids[slot] = moved_id
+            self._slots[moved_id] = slot
+        
+        for column in self._columns.values():
+            column.pop()
+        self.ids.pop()
+        self._slots[piece_id] = -1
+    
+    def slot(self, piece_id):
+        return self._slots[piece_id]
+    
+    def get(self, piece_id, name):
+        value = self._columns[name][self._slots[piece_id]]
+        return PIECE_TYPES[value] if name == "type" else value
+    
+    def set(self, piece_id, name, value):
+        """Change one field of a row, through the owning track's placement check"""
+        owner = self.owner
+        if owner is None:
+            self.update(piece_id, {name: value})
+        elif not owner.update_piece(self.piece(piece_id), **{name: value}):
+            raise ValueError(
+                f"Cannot set {name} to {value!r}: the piece would overlap "
+                f"another piece or leave the grid"
+            )
+    
+    def update(self, piece_id, changes):
+        """Write several fields of a row at once, reindexing it with the owner only once"""
+        # Convert first so a bad value leaves the row and its index untouched
+        changes = {name: self._column_value(name, value) for name, value in changes.items()}
+        
+        owner = self.owner
+        if owner is not None:
+            owner._unindex_piece(piece_id)
+        
+        slot = self._slots[piece_id]
+        for name, value in changes.items():
+            self._columns[name][slot] = value
+        
+        if owner is not None:
+            owner._index_piece(piece_id)
+    
+    def row(self, piece_id):
+        """Return (type, x, y, rotation, length) for a piece"""
+        slot = self._slots[piece_id]
+        return (
+            PIECE_TYPES[self.types[slot]],
+            self.xs[slot],
+            self.ys[slot],
+            self.rotations[slot],
+            self.lengths[slot]
+        )
+    
+    def piece(self, piece_id):
+        """Return the Piece view for an id, reusing a live view if there is one"""
+        view = self._views.get(piece_id)
+        if view is None:
+            view = Piece.__new__(Piece)
+            view._store = self
+            view._id = piece_id
+            self._views[piece_id] = view
+        return view
+    
+    def attach(self, piece, piece_id):
+        """Turn a free-standing piece into the view for an existing row"""
+        piece._store = self
+        piece._id = piece_id
+        self._views[piece_id] = piece
+
+def straight_feet(straight_units, lane_width):
+    """Convert a total straight length in grid units to feet (lane width is in inches)"""
+    return round((straight_units * lane_width) / 12, 2)
+
+class MaterialTally:
+    """
+    Running material counts for a track
+    
+    The track adds and subtracts each piece as it is placed, changed or
+    removed, so the bill of materials never needs a full recount.
+    """
+    def __init__(self, track):
+        self.track = track
+        self.straight_units = 0  # Total straight length in grid units
+        self.counts = [0] * len(PIECE_TYPES)  # Pieces per type code
+        self._snapshot = None
+    
+    def add(self, type_code, length):
+        self.counts[type_code] += 1
+        if type_code == STRAIGHT_CODE:
+            self.straight_units += length
+        self._snapshot = None
+    
+    def remove(self, type_code, length):
+        self.counts[type_code] -= 1
+        if type_code == STRAIGHT_CODE:
+            self.straight_units -= length
+        self._snapshot = None
+    
+    def snapshot(self):
+        """Return the bill of materials for the current counts"""
+        if self._snapshot is None:
+            counts = self.counts
+            
+            # One connector per joint between two mated ports
+            connectors = self.track.connections.joint_count
+            
+            self._snapshot = {
+                "straight_feet": straight_feet(self.straight_units, self.track.lane_width),
+                "elbows_22_5": counts[PIECE_TYPE_CODES[PieceType.ELBOW_22_5]],
+                "elbows_45": counts[PIECE_TYPE_CODES[PieceType.ELBOW_45]],
+                "elbows_90": counts[PIECE_TYPE_CODES[PieceType.ELBOW_90]],
+                "t_junctions": counts[PIECE_TYPE_CODES[PieceType.T_JUNCTION]],
+                "connectors": connectors,
+                "screws": connectors * 2  # Assuming each connector needs two screws
+            }
+        return dict(self._snapshot)
+
+class ConnectionGraph:
+    """
+    Joints between the ports of placed pieces
+    
+    Two ports mate when they sit in neighbouring cells and face each other.
+    The track updates the graph as each piece is indexed or unindexed, so an
+    edit only looks at the cells next to the edited piece. Connected
+    components use union-find, which is extended on every join and rebuilt
+    lazily after a removal may have split a component.
+    """
+    def __init__(self, track):
+        self.track = track
+        self.joint_count = 0
+        self.port_count = 0
+        self.piece_count = 0
+        
+        # Port (piece id * MAX_PORTS + port index) -> linked piece id and its
+        # port index, -1 when the port is open. Flat arrays keep this at a few
+        # dozen bytes per piece instead of a dict per piece.
+        self._link_ids = array("i")
+        self._link_ports = array("b")
+        
+        self._parent = array("i")  # Union-find parent of each piece id
+        self._components = 0
+        self._stale = False
+    
+    def link(self, piece_id, index):
+        """Return (other piece id, other port index) joined to a port, or None"""
+        port = piece_id * MAX_PORTS + index
+        if port >= len(self._link_ids) or self._link_ids[port] < 0:
+            return None
+        return self._link_ids[port], self._link_ports[port]
+    
+    def links(self, piece_id):
+        """Return {port index: (other piece id, other port index)} for a piece's joined ports"""
+        base = piece_id * MAX_PORTS
+        link_ids = self._link_ids
+        return {
+            index: (link_ids[base + index], self._link_ports[base + index])
+            for index in range(MAX_PORTS)
+            if base + index < len(link_ids) and link_ids[base + index] >= 0
+        }
+    
+    def add(self, piece_id):
+        """Connect a newly indexed piece to the pieces its ports face"""
+        track = self.track
+        piece_ports = track._piece_ports(piece_id)
+        self.port_count += len(piece_ports)
+        self.piece_count += 1
+        
+        # Grow the flat arrays to cover the new id (ids are never reused)
+        missing = piece_id + 1 - len(self._parent)
+        if missing > 0:
+            self._parent.extend(range(len(self._parent), piece_id + 1))
+            self._link_ids.extend([-1] * (missing * MAX_PORTS))
+            self._link_ports.extend([-1] * (missing * MAX_PORTS))
+        
+        if not self._stale:
+            self._parent[piece_id] = piece_id
+            self._components += 1
+        
+        for index, ((cell_x, cell_y), (dx, dy)) in enumerate(piece_ports):
+            neighbour = (cell_x + dx, cell_y + dy)
+            other_id = track.occupancy.get(neighbour)
+            if other_id is None or other_id == piece_id:
+                continue
+            
+            facing = (-dx, -dy)
+            for other_index, (other_cell, other_direction) in enumerate(track._piece_ports(other_id)):
+                if other_cell == neighbour and other_direction == facing:
+                    self._set_link(piece_id, index, other_id, other_index)
+                    self._set_link(other_id, other_index, piece_id, index)
+                    self.joint_count += 1
+                    if not self._stale:
+                        self._union(piece_id, other_id)
+                    break
+    
+    def remove(self, piece_id):
+        """Disconnect a piece that is about to be unindexed"""
+        self.port_count -= len(self.track._piece_ports(piece_id))
+        self.piece_count -= 1
+        
+        for index, (other_id, other_index) in self.links(piece_id).items():
+            self._set_link(piece_id, index, -1, -1)
+            self._set_link(other_id, other_index, -1, -1)
+            self.joint_count -= 1
+        
+        # Removing a piece can split its component, so recount on the next query
+        self._stale = True
+    
+    def component_count(self):
+        """Number of separate connected runs of pieces"""
+        if self._stale:
+            placed = self.track.store.ids
+            parent = self._parent
+            for piece_id in placed:
+                parent[piece_id] = piece_id
+            self._components = len(placed)
+            for piece_id in placed:
+                for other_id, _ in self.links(piece_id).values():
+                    self._union(piece_id, other_id)
+            self._stale = False
+        return self._components
+    
+    def summary(self):
+        """Return joint, open end, loop and component counts"""
+        components = self.component_count()
+        return {
+            "connectors": self.joint_count,
+            "open_ends": self.port_count - 2 * self.joint_count,
+            "loops": self.joint_count - self.piece_count + components,
+            "components": components
+        }
+    
+    def joined(self, piece_id, cell, other_id, other_cell):
+        """Whether two pieces are joined across the edge between two neighbouring cells"""
+        port = (cell, (other_cell[0] - cell[0], other_cell[1] - cell[1]))
+        for index, (linked_id, _) in self.links(piece_id).items():
+            # Only look up ports for pieces that are linked at all
+            if linked_id == other_id and self.track._piece_ports(piece_id)[index] == port:
+                return True
+        return False
+    
+    def _set_link(self, piece_id, index, other_id, other_index):
+        port = piece_id * MAX_PORTS + index
+        self._link_ids[port] = other_id
+        self._link_ports[port] = other_index
+    
+    def _find(self, piece_id):
+        parent = self._parent
+        while parent[piece_id] != piece_id:
+            parent[piece_id] = parent[parent[piece_id]]
+            piece_id = parent[piece_id]
+        return piece_id
+    
+    def _union(self, a, b):
+        root_a = self._find(a)
+        root_b = self._find(b)
+        if root_a != root_b:
+            self._parent[root_b] = root_a
+            self._components -= 1
+
+# A run of free cells in a row of the type plane
+_FREE_RUN = re.compile(rb"\x00+")
+
+class OccupancyGrid:
+    """
+    Board-level planes recording which piece covers each grid cell
+    
+    Cells are stored row-major at y * width + x. The `types` plane holds 0
+    for a free cell or the piece type code + 1, and the `ids` plane holds the
+    id of the covering piece (-1 when free). The track writes both on every
+    edit, so whole-board questions scan flat buffers instead of the pieces.
+    
+    The planes take 5 bytes per cell, so they are only allocated when the
+    first piece is placed; until then both are None and the board is empty.
+    """
+    def __init__(self, width, height):
+        self.width = max(0, width)
+        self.height = max(0, height)
+        self.types = None
+        self.ids = None
+    
+    def __len__(self):
+        return self.width * self.height
+    
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+    
+    def get(self, cell):
+        """Return the id of the piece covering a cell, or None"""
+        x, y = cell
+        if self.ids is not None and 0 <= x < self.width and 0 <= y < self.height:
+            piece_id = self.ids[y * self.width + x]
+            if piece_id >= 0:
+                return piece_id
+        return None
+    
+    def place(self, cells, piece_id, type_code):
+        """Mark cells as covered by a piece (cells off the grid are ignored)"""
+        if self.types is None:
+            self.types = bytearray(len(self))
+            self.ids = array("i", [-1]) * len(self)
+        
+        width = self.width
+        for x, y in cells:
+            if 0 <= x < width and 0 <= y < self.height:
+                index = y * width + x
+                self.types[index] = type_code + 1
+                self.ids[index] = piece_id
+    
+    def clear(self, cells, piece_id):
+        """Free the cells still covered by a piece"""
+        if self.ids is None:
+            return
+        
+        width = self.width
+        for x, y in cells:
+            if 0 <= x < width and 0 <= y < self.height:
+                index = y * width + x
+                if self.ids[index] == piece_id:
+                    self.types[index] = 0
+                    self.ids[index] = -1
+    
+    def free_count(self):
+        """Number of cells not covered by any piece"""
+        if self.types is None:
+            return len(self)
+        return self.types.count(0)
+    
+    def occupied_cells(self):
+        """Return every covered cell, in row-major order"""
+        if self.types is None:
+            return []
+        
+        width = self.width
+        return [
+            (index % width, index // width)
+            for index in compress(range(len(self.types)), self.types)
+        ]
+    
+    def row(self, y, start=0, end=None):
+        """Return the type plane for part of a row as bytes"""
+        end = self.width if end is None else min(end, self.width)
+        if self.types is None:
+            return bytes(max(0, end - start))
+        
+        base = y * self.width
+        return bytes(self.types[base + start:base + end])
+    
+    def plane(self):
+        """Return a snapshot of the whole type plane as bytes"""
+        if self.types is None:
+            return bytes(len(self))
+        return bytes(self.types)
+    
+    def fits(self, cell_groups):
+        """
+        Check a batch of pieces for placement, one group of cells per piece
+        
+        Returns a list of booleans: a group fits if it stays on the grid and
+        covers no occupied cell and no cell of an earlier group that fitted,
+        matching what adding the pieces one by one would do.
+        """
+        width = self.width
+        height = self.height
+        types = self.types if self.types is not None else b""
+        claimed = set()  # Cells of the groups accepted so far
+        results = []
+        for cells in cell_groups:
+            indexes = []
+            for x, y in cells:
+                if not (0 <= x < width and 0 <= y < height):
+                    indexes = None
+                    break
+                index = y * width + x
+                if (types and types[index]) or index in claimed:
+                    indexes = None
+                    break
+                indexes.append(index)
+            if indexes is not None:
+                claimed.update(indexes)
+            results.append(indexes is not None)
+        return results
+    
+    def fill_region(self, x, y):
+        """
+        Flood fill the free region containing a cell
+        
+        Returns a mask plane (same layout as `types`) with 1 for every free
+        cell 4-connected to (x, y). The fill works on runs of free cells,
+        found a row at a time with a regex scan of the type plane.
+        """
+        width = self.width
+        types = self.types if self.types is not None else bytes(len(self))
+        mask = bytearray(len(types))
+        if not self.in_bounds(x, y) or types[y * width + x]:
+            return mask
+        
+        runs = {}  # Row -> (run starts, run ends), both as plane indexes
+        
+        def row_runs(row):
+            found = runs.get(row)
+            if found is None:
+                base = row * width
+                spans = [run.span() for run in _FREE_RUN.finditer(types, base, base + width)]
+                found = runs[row] = ([s for s, _ in spans], [e for _, e in spans])
+            return found
+        
+        # (row, first column, end column) of a filled run whose neighbours to visit
+        pending = [(y, x, x + 1)]
+        while pending:
+            row, start, end = pending.pop()
+            base = row * width
+            starts, ends = row_runs(row)
+            
+            # Runs overlapping [start, end) in this row
+            i = bisect_right(ends, base + start)
+            while i < len(starts) and starts[i] < base + end:
+                run_start, run_end = starts[i], ends[i]
+                i += 1
+                if mask[run_start]:
+                    continue
                 
-        return cells
+                mask[run_start:run_end] = b"\x01" * (run_end - run_start)
+                if row > 0:
+                    pending.append((row - 1, run_start - base, run_end - base))
+                if row + 1 < self.height:
+                    pending.append((row + 1, run_start - base, run_end - base))
+        return mask
+
+# Piece types the auto-router lays between straights
+ROUTE_ELBOWS = (PieceType.ELBOW_90, PieceType.ELBOW_45)
+
+@lru_cache(maxsize=64)
+def _elbow_moves(direction):
+    """
+    Return the ways an elbow can continue a lane travelling in a direction
+    
+    Each move is (piece type, rotation, base offset, covered cell offsets,
+    exit cell offset, exit direction), with offsets relative to the cell
+    the lane enters.
+    """
+    facing = (-direction[0], -direction[1])
+    moves = []
+    for piece_type in ROUTE_ELBOWS:
+        for rotation in [0, 90, 180, 270]:
+            piece_ports = ports(piece_type, rotation, 1)
+            for index, (in_offset, in_direction) in enumerate(piece_ports):
+                if in_direction != facing:
+                    continue
+                
+                base = (-in_offset[0], -in_offset[1])
+                cells = tuple(
+                    (base[0] + dx, base[1] + dy) for dx, dy in footprint(piece_type, rotation, 1)
+                )
+                out_offset, out_direction = piece_ports[1 - index]
+                exit_cell = (base[0] + out_offset[0], base[1] + out_offset[1])
+                moves.append((piece_type, rotation, base, cells, exit_cell, out_direction))
+    return tuple(moves)
+
+# Binary track files (.gtrk): a fixed header followed by one packed,
+# little-endian block per store column, widest items first
+TRACK_FILE_MAGIC = b"GTRK"
+TRACK_FILE_VERSION = 1
+TRACK_FILE_HEADER = struct.Struct("<4sHxxdddQ")  # magic, version, width, depth, lane width, piece count
+TRACK_FILE_COLUMNS = ("x", "y", "rotation", "length", "type")
+
+# Most changed cells a view is told about individually before it repaints everything
+DIRTY_CELL_LIMIT = 4096
+
+# Pieces are 2" x 2" downspout gutter laid down the middle of their cells
+GUTTER_WIDTH = 2  # In inches
+
+def check_track_dimensions(width, depth, lane_width):
+    """
+    Raise ValueError unless the dimensions pass utils.validate_dimensions
+    
+    Deserializers call this before building a Track from untrusted data, so
+    a header can't ask for an arbitrarily large grid.
+    """
+    from utils import validate_dimensions  # Import here to avoid circular imports
+    
+    errors = validate_dimensions(width, depth, lane_width)
+    if errors:
+        raise ValueError("Invalid track dimensions: " + "; ".join(errors))
 
 class Track:
     def __init__(self, width, depth, lane_width):
         self.width = width  # In feet
         self.depth = depth  # In feet
         self.lane_width = lane_width  # In inches
-        self.pieces = []
+        self.store = PieceStore(owner=self)
         
         # Calculate grid dimensions
         self.grid_width = int(width * 12 / lane_width)  # Columns
         self.grid_height = int(depth * 12 / lane_width)  # Rows
+        
+        # Type and id of the piece covering each grid cell, maintained on every edit
+        self.occupancy = OccupancyGrid(self.grid_width, self.grid_height)
+        
+        # Bill of materials counts, adjusted as pieces are added, changed or removed
+        self.materials = MaterialTally(self)
+        
+        # Port-to-port joints between placed pieces
+        self.connections = ConnectionGraph(self)
+        
+        # Cells touched by edits since the view last asked for them. None until
+        # a view starts asking, or after too many edits to track cell by cell.
+        self._dirty_cells = None
+        
+        # Layout hash, computed on demand and dropped on every edit
+        self._content_hash = None
+    
+    @property
+    def pieces(self):
+        """List of views of the placed pieces"""
+        store = self.store
+        return [store.piece(piece_id) for piece_id in store.ids]
     
     def add_piece(self, piece):
         """Add a piece to the track if it doesn't overlap with existing pieces"""
-        if self.can_place_piece(piece):
-            self.pieces.append(piece)
+        if piece._store is None and self.can_place_piece(piece):
+            piece_id = self.store.add(piece._type, piece._x, piece._y, piece._rotation, piece._length)
+            self.store.attach(piece, piece_id)
+            self._index_piece(piece_id)
             return True
         return False
     
     def remove_piece(self, piece):
         """Remove a piece from the track"""
-        if piece in self.pieces:
-            self.pieces.remove(piece)
+        if piece._store is self.store:
+            self._unindex_piece(piece._id)
+            self.store.remove(piece._id)
             return True
         return False
     
+    def update_piece(self, piece, **changes):
+        """
+        Change properties (rotation, length, x, y) of a placed piece
+        
+        The change is only applied if the resulting piece stays inside the grid
+        and doesn't overlap other pieces. Returns True if it was applied.
+        Only the final footprint is checked, and a placed piece is reindexed
+        once with all the changes, so no intermediate state is ever indexed.
+        """
+        # Build the candidate from the final values, so a type change is
+        # checked with the length the piece will really have
+        values = dict(zip(PieceStore.FIELDS, (piece.type, piece.x, piece.y, piece.rotation, piece.length)))
+        values.update(changes)
+        candidate = Piece(values["type"], values["x"], values["y"], values["rotation"], values["length"])
+        
+        if not self.can_place_piece(candidate, ignore=piece):
+            return False
+        
+        # Like a new Piece, only a straight keeps a length other than 1
+        if candidate.length != values["length"]:
+            changes = dict(changes, length=candidate.length)
+        
+        if piece._store is self.store:
+            self.store.update(piece._id, changes)
+        else:
+            for name, value in changes.items():
+                setattr(piece, name, value)
+        return True
+    
     def piece_at_position(self, grid_x, grid_y):
         """Find if there's a piece at the given grid position"""
-        for piece in self.pieces:
-            occupied_cells = piece.get_occupied_cells(self.lane_width)
-            if (grid_x, grid_y) in occupied_cells:
-                return piece
-        return None
+        piece_id = self.occupancy.get((grid_x, grid_y))
+        if piece_id is None:
+            return None
+        return self.store.piece(piece_id)
+    
+    def occupied_cells(self):
+        """Return every grid cell currently covered by a piece"""
+        return self.occupancy.occupied_cells()
+    
+    def free_cell_count(self):
+        """Number of grid cells not covered by any piece"""
+        return self.occupancy.free_count()
+    
+    def free_region(self, grid_x, grid_y):
+        """Return the free cells reachable from a grid position without crossing a piece"""
+        width = self.grid_width
+        mask = self.occupancy.fill_region(grid_x, grid_y)
+        return [
+            (index % width, index // width)
+            for index in compress(range(len(mask)), mask)
+        ]
+    
+    def take_dirty_cells(self):
+        """
+        Return the cells touched by edits since the last call and reset the set
+        
+        Edits are only recorded once a view has started calling this, so
+        headless tracks don't collect them. Returns None if the edits weren't
+        tracked cell by cell (before the first call, or after more than
+        DIRTY_CELL_LIMIT cells changed), meaning everything should be repainted.
+        """
+        dirty_cells = self._dirty_cells
+        self._dirty_cells = set()
+        return dirty_cells
     
-    def can_place_piece(self, piece):
+    def _mark_dirty(self, cells):
+        dirty_cells = self._dirty_cells
+        if dirty_cells is not None:
+            dirty_cells.update(cells)
+            if len(dirty_cells) > DIRTY_CELL_LIMIT:
+                self._dirty_cells = None
+    
+    def can_place_piece(self, piece, ignore=None):
         """Check if a piece can be placed without overlap"""
+        if not self.fits_length(piece.length):
+            return False
         occupied_cells = piece.get_occupied_cells(self.lane_width)
         
         # Check grid boundaries
@@ -121,30 +1002,408 @@ class Track:
             if cell_x < 0 or cell_x >= self.grid_width or cell_y < 0 or cell_y >= self.grid_height:
                 return False
         
-        # Check for overlap with existing pieces
-        for existing_piece in self.pieces:
-            if existing_piece == piece:  # Skip the piece itself
+        # Check for overlap with existing pieces (skipping the piece itself)
+        if ignore is None:
+            ignore = piece
+        ignore_id = ignore._id if ignore._store is self.store else None
+        for cell in occupied_cells:
+            existing_id = self.occupancy.get(cell)
+            if existing_id is not None and existing_id != ignore_id:
+                return False
+        
+        return True
+    
+    def can_place_pieces(self, pieces):
+        """
+        Check a batch of unplaced pieces in one pass over the occupancy planes
+        
+        Returns a list of booleans saying which pieces add_piece would accept
+        if they were added in order.
+        """
+        pieces = list(pieces)
+        fits = self.occupancy.fits(
+            # Pieces already on a track or longer than the board are refused, so they claim no cells
+            piece.get_occupied_cells(self.lane_width) if self._may_place(piece) else ()
+            for piece in pieces
+        )
+        return [fit and self._may_place(piece) for piece, fit in zip(pieces, fits)]
+    
+    def _may_place(self, piece):
+        return piece._store is None and self.fits_length(piece.length)
+    
+    def fits_length(self, length):
+        """
+        Check a piece length could fit on the board at all
+        
+        A straight longer than the board's longest side always leaves the
+        grid, so its cells never need to be built.
+        """
+        return 1 <= length <= max(self.grid_width, self.grid_height)
+    
+    def find_pinch_points(self, min_width=None, cells=None):
+        """
+        Find every place where the lane between two walls is too narrow
+        
+        Each piece is a gutter wall GUTTER_WIDTH inches wide down the middle
+        of its cells, so walls with k free cells between them along a row or
+        column leave a lane of (k + 1) * lane_width - GUTTER_WIDTH inches, and
+        sqrt(2) times the spacing along a diagonal. Every row, column and
+        diagonal of the occupancy type plane is scanned for wall cells closer
+        than min_width allows, so walls running at an angle are caught too.
+        Neighbouring cells of one piece, or of two pieces joined across that
+        edge, are one continuous wall and not a pinch; neither are diagonal
+        neighbours with a wall cell in the corner between them, since that
+        corner is already measured along its row and column. Lanes running
+        into the edge of the board aren't checked.
+        
+        An edit can only change the pinches on the lines through the cells
+        it touched (and the diagonals either side of them), so after an edit
+        pass those cells to rescan just those lines instead of the whole board.
+        
+        Args:
+            min_width: Narrowest acceptable lane in inches (defaults to lane_width)
+            cells: Only scan the lines through these grid cells
+            
+        Returns:
+            List of pinch points, each with the axis it was measured along
+            ("x", "y", "diagonal" for x and y increasing together or
+            "anti-diagonal" for x falling as y grows), the two wall cells, the
+            number of free cells between them, the lane width in inches and
+            the two piece ids
+        """
+        if min_width is None:
+            min_width = self.lane_width
+        
+        occupancy = self.occupancy
+        if occupancy.types is None:
+            return []
+        
+        ids = occupancy.ids
+        width = occupancy.width
+        height = occupancy.height
+        joined = self.connections.joined
+        pinches = []
+        
+        def matcher(spacing):
+            # Most free cells a lane can span and still be narrower than
+            # min_width, and the lane width for each gap up to that
+            max_gap = math.ceil((min_width + GUTTER_WIDTH) / spacing) - 2
+            if max_gap < 0:
+                return None, []
+            
+            # Two wall cells with up to max_gap free cells between them; the
+            # lookahead lets a wall cell end one match and start the next
+            pattern = re.compile(rb"(?=[^\x00](\x00{0,%d})[^\x00])" % max_gap)
+            return pattern, [(gap + 1) * spacing - GUTTER_WIDTH for gap in range(max_gap + 1)]
+        
+        straight_pattern, straight_lanes = matcher(self.lane_width)
+        if straight_pattern is None:
+            return []
+        diagonal_pattern, diagonal_lanes = matcher(self.lane_width * math.sqrt(2))
+        
+        def scan(axis, line, first, stride, pattern, lanes):
+            # `line` is a row, column or diagonal of the type plane starting
+            # at plane index `first`, with consecutive cells `stride` apart
+            for match in pattern.finditer(line):
+                gap = match.end(1) - match.start(1)
+                index = first + match.start() * stride
+                other_index = index + (gap + 1) * stride
+                piece_id = ids[index]
+                other_id = ids[other_index]
+                if gap == 0 and piece_id == other_id:
+                    continue
+                
+                if gap == 0 and axis.endswith("diagonal"):
+                    # Diagonal neighbours; the corner cells are the one beside
+                    # this cell along the row and the one below it
+                    if types[index + stride - width] or types[index + width]:
+                        continue
+                
+                cell = (index % width, index // width)
+                other_cell = (other_index % width, other_index // width)
+                if gap == 0 and joined(piece_id, cell, other_id, other_cell):
+                    continue
+                
+                if lanes[gap] < min_width:
+                    pinches.append({
+                        "axis": axis,
+                        "start": cell,
+                        "end": other_cell,
+                        "gap": gap,
+                        "width": lanes[gap],
+                        "pieces": (piece_id, other_id)
+                    })
+        
+        if cells is None:
+            rows = range(height)
+            columns = range(width)
+            diagonals = range(1 - height, width)
+            anti_diagonals = range(width + height - 1)
+        else:
+            cells = [(x, y) for x, y in cells if 0 <= x < width and 0 <= y < height]
+            rows = sorted({y for _, y in cells})
+            columns = sorted({x for x, _ in cells})
+            # A cell is also the corner between diagonal neighbours on the
+            # diagonals either side of its own
+            diagonals = sorted({x - y + step for x, y in cells for step in (-1, 0, 1)
+                                if 1 - height <= x - y + step < width})
+            anti_diagonals = sorted({x + y + step for x, y in cells for step in (-1, 0, 1)
+                                     if 0 <= x + y + step < width + height - 1})
+        
+        types = occupancy.plane()
+        for y in rows:
+            scan("x", types[y * width:(y + 1) * width], y * width, 1,
+                 straight_pattern, straight_lanes)
+        for x in columns:
+            scan("y", types[x::width], x, width, straight_pattern, straight_lanes)
+        
+        if diagonal_pattern is None:
+            return pinches
+        
+        # Diagonal number x - y runs down and to the right from the top or
+        # left edge; anti-diagonal number x + y runs down and to the left
+        # from the top or right edge
+        for number in diagonals:
+            x, y = max(number, 0), max(-number, 0)
+            count = min(width - x, height - y)
+            first = y * width + x
+            stride = width + 1
+            scan("diagonal", types[first:first + (count - 1) * stride + 1:stride], first,
+                 stride, diagonal_pattern, diagonal_lanes)
+        for number in anti_diagonals if width > 1 else ():
+            x, y = min(number, width - 1), max(number - width + 1, 0)
+            count = min(x + 1, height - y)
+            first = y * width + x
+            stride = width - 1
+            scan("anti-diagonal", types[first:first + (count - 1) * stride + 1:stride], first,
+                 stride, diagonal_pattern, diagonal_lanes)
+        
+        return pinches
+    
+    def auto_route(self, start, end, start_heading=None, end_heading=None,
+                   max_length=MAX_STRAIGHT_LENGTH, max_expansions=5000, weight=1.5, prices=None,
+                   time_budget=0.1):
+        """
+        Find the cheapest run of pieces joining two grid cells through free space
+        
+        The lane enters start travelling in start_heading and leaves end
+        travelling in end_heading; either heading may be None to allow any.
+        Headings are (dx, dy) unit steps such as EAST. The search is A* over
+        (cell, heading) states, laying straights of 1..max_length cells and
+        45°/90° elbows, priced with calculate_materials_cost including one
+        connector per joint. A weight above 1 inflates the heuristic so the
+        search expands far fewer states; the route then costs at most weight
+        times the optimum.
+        
+        Returns a list of unplaced Pieces, or None if either end is blocked
+        or no route was found within max_expansions expanded states and
+        time_budget seconds (None for no time limit).
+        """
+        from utils import calculate_materials_cost  # Import here to avoid circular imports
+        
+        # Unit prices: per straight cell, per elbow and per joint
+        unit_cost = calculate_materials_cost({
+            "straight_feet": self.lane_width / 12,
+            "elbows_22_5": 0,
+            "elbows_45": 1,
+            "elbows_90": 1,
+            "t_junctions": 0,
+            "connectors": 1,
+            "screws": 2
+        }, prices)
+        cell_cost = unit_cost["straight"]
+        joint_cost = unit_cost["connectors"] + unit_cost["screws"]
+        elbow_cost = {
+            PieceType.ELBOW_45: unit_cost["elbows_45"],
+            PieceType.ELBOW_90: unit_cost["elbows_90"]
+        }
+        
+        # Admissible heuristic: every move costs at least `axis_cost` per cell it
+        # advances along one axis and `diagonal_cost` per step it advances along both
+        axis_cost = cell_cost + joint_cost / max_length
+        diagonal_cost = 2 * axis_cost
+        for direction in [EAST, SOUTH_EAST]:
+            for piece_type, _, _, _, exit_cell, exit_direction in _elbow_moves(direction):
+                advance = sorted((
+                    abs(exit_cell[0] + exit_direction[0]),
+                    abs(exit_cell[1] + exit_direction[1])
+                ))
+                if advance[0]:
+                    move_cost = elbow_cost[piece_type] + joint_cost
+                    diagonal_cost = min(
+                        diagonal_cost,
+                        (move_cost - (advance[1] - advance[0]) * axis_cost) / advance[0]
+                    )
+        diagonal_cost = max(diagonal_cost, axis_cost)
+        end_x, end_y = end
+        
+        def heuristic(cell):
+            distance_x = abs(end_x - cell[0])
+            distance_y = abs(end_y - cell[1])
+            both = min(distance_x, distance_y)
+            return both * diagonal_cost + (max(distance_x, distance_y) - both) * axis_cost
+        
+        # Flat copy of the occupancy for fast free-cell tests during the search
+        grid_width = self.grid_width
+        grid_height = self.grid_height
+        blocked = self.occupancy.plane()
+        
+        def is_free(cell):
+            x, y = cell
+            return 0 <= x < grid_width and 0 <= y < grid_height and not blocked[y * grid_width + x]
+        
+        # A blocked end would otherwise only be given up on once the budget runs out
+        if not is_free(start) or not is_free(end):
+            return None
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        
+        headings = [start_heading] if start_heading else [EAST, SOUTH, WEST, NORTH]
+        best = {}
+        came_from = {}
+        queue = []
+        counter = 0
+        for heading in headings:
+            state = (start, heading)
+            best[state] = 0
+            came_from[state] = None
+            heapq.heappush(queue, (weight * heuristic(start), 0, counter, 0, state, False))
+            counter += 1
+        
+        expansions = 0
+        while queue:
+            _, _, _, cost, state, is_goal = heapq.heappop(queue)
+            if is_goal:
+                return self._route_pieces(came_from, state)
+            if cost > best.get(state, cost):
                 continue
+            
+            expansions += 1
+            if expansions > max_expansions:
+                return None
+            if deadline is not None and not expansions % 256 and time.perf_counter() > deadline:
+                return None
+            
+            (cell_x, cell_y), (dx, dy) = state
+            moves = []
+            
+            # Straights carry on in the current direction (axis directions only)
+            if dx == 0 or dy == 0:
+                rotation = {EAST: 0, SOUTH: 90, WEST: 180, NORTH: 270}[(dx, dy)]
+                for length in range(1, max_length + 1):
+                    last = (cell_x + dx * (length - 1), cell_y + dy * (length - 1))
+                    if not is_free(last):
+                        break
+                    if dx + dy > 0:
+                        base = (cell_x, cell_y)
+                    else:
+                        base = last
+                    piece = (PieceType.STRAIGHT, base, rotation, length)
+                    moves.append((piece, last, (dx, dy), length * cell_cost + joint_cost))
+            
+            # Elbows turn the lane
+            for piece_type, rotation, base, cells, exit_cell, exit_direction in _elbow_moves((dx, dy)):
+                if all(is_free((cell_x + ox, cell_y + oy)) for ox, oy in cells):
+                    piece = (piece_type, (cell_x + base[0], cell_y + base[1]), rotation, 1)
+                    exit_cell = (cell_x + exit_cell[0], cell_y + exit_cell[1])
+                    moves.append((piece, exit_cell, exit_direction, elbow_cost[piece_type] + joint_cost))
+            
+            for piece, exit_cell, exit_direction, move_cost in moves:
+                new_cost = cost + move_cost
+                if exit_cell == end and (end_heading is None or exit_direction == end_heading):
+                    goal = ("goal", counter)
+                    came_from[goal] = (state, piece)
+                    heapq.heappush(queue, (new_cost, 0, counter, new_cost, goal, True))
+                    counter += 1
                 
-            existing_cells = existing_piece.get_occupied_cells(self.lane_width)
-            for cell in occupied_cells:
-                if cell in existing_cells:
-                    return False
+                next_cell = (exit_cell[0] + exit_direction[0], exit_cell[1] + exit_direction[1])
+                next_state = (next_cell, exit_direction)
+                if new_cost < best.get(next_state, float("inf")):
+                    best[next_state] = new_cost
+                    came_from[next_state] = (state, piece)
+                    remaining = weight * heuristic(next_cell)
+                    heapq.heappush(queue, (new_cost + remaining, remaining, counter, new_cost, next_state, False))
+                    counter += 1
         
-        return True
+        return None
+    
+    def _route_pieces(self, came_from, state):
+        """Walk A* parent links back from a goal state into a list of pieces"""
+        pieces = []
+        while came_from[state] is not None:
+            state, (piece_type, (base_x, base_y), rotation, length) = came_from[state]
+            pieces.append(Piece(
+                piece_type,
+                x=base_x * self.lane_width,
+                y=base_y * self.lane_width,
+                rotation=rotation,
+                length=length
+            ))
+        pieces.reverse()
+        return pieces
+    
+    def _piece_cells(self, piece_id):
+        """
+        Return the absolute cells of a placed piece
+        
+        Computed from the shared footprint table rather than cached per
+        piece, which would cost more memory than the store row itself.
+        """
+        piece_type, x, y, rotation, length = self.store.row(piece_id)
+        return _occupied_cells(piece_type, x, y, rotation, length, self.lane_width)
+    
+    def _piece_ports(self, piece_id):
+        piece_type, x, y, rotation, length = self.store.row(piece_id)
+        return _piece_ports(piece_type, x, y, rotation, length, self.lane_width)
+    
+    def content_hash(self):
+        """Return the order-independent layout hash of the track (see layout_hash)"""
+        if self._content_hash is None:
+            store = self.store
+            self._content_hash = layout_hash(
+                self.width, self.depth, self.lane_width,
+                zip(
+                    (PIECE_TYPES[code].value for code in store.types),
+                    store.xs, store.ys, store.rotations, store.lengths
+                )
+            )
+        return self._content_hash
+    
+    def _index_piece(self, piece_id):
+        """Record a placed piece in the occupancy map, material tally and connections"""
+        self._content_hash = None
+        cells = self._piece_cells(piece_id)
+        slot = self.store.slot(piece_id)
+        self.occupancy.place(cells, piece_id, self.store.types[slot])
+        self._mark_dirty(cells)
+        
+        self.materials.add(self.store.types[slot], self.store.lengths[slot])
+        self.connections.add(piece_id)
+    
+    def _unindex_piece(self, piece_id):
+        """Drop a placed piece from the occupancy map, material tally and connections"""
+        self._content_hash = None
+        self.connections.remove(piece_id)
+        
+        cells = self._piece_cells(piece_id)
+        self.occupancy.clear(cells, piece_id)
+        self._mark_dirty(cells)
+        
+        slot = self.store.slot(piece_id)
+        self.materials.remove(self.store.types[slot], self.store.lengths[slot])
     
     def to_dict(self):
         """Convert track to dictionary for serialization"""
         return {
-            "width": self.width,
-            "depth": self.depth,
-            "lane_width": self.lane_width,
+            "width": _number(self.width),
+            "depth": _number(self.depth),
+            "lane_width": _number(self.lane_width),
             "pieces": [piece.to_dict() for piece in self.pieces]
         }
     
     @classmethod
     def from_dict(cls, data):
         """Create a track from a dictionary representation"""
+        check_track_dimensions(data["width"], data["depth"], data["lane_width"])
         track = cls(
             width=data["width"],
             depth=data["depth"],
@@ -155,15 +1414,95 @@ class Track:
             track.add_piece(Piece.from_dict(piece_data))
         
         return track
+    
+    def to_bytes(self):
+        """Serialize the track to the binary .gtrk format"""
+        store = self.store
+        blocks = [TRACK_FILE_HEADER.pack(
+            TRACK_FILE_MAGIC, TRACK_FILE_VERSION,
+            self.width, self.depth, self.lane_width, len(store)
+        )]
+        
+        for name in TRACK_FILE_COLUMNS:
+            column = store._columns[name]
+            if sys.byteorder == "big" and column.itemsize > 1:
+                column = array(column.typecode, column)
+                column.byteswap()
+            blocks.append(column.tobytes())
+        
+        return b"".join(blocks)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Create a track from the binary .gtrk format
+        
+        Accepts anything supporting the buffer protocol (bytes, mmap, ...).
+        Each column block is copied straight into the piece store, so no
+        per-piece objects are built while loading.
+        """
+        with memoryview(data) as view:
+            if len(view) < TRACK_FILE_HEADER.size:
+                raise ValueError("Track file is truncated")
+            
+            magic, version, width, depth, lane_width, count = TRACK_FILE_HEADER.unpack_from(view)
+            if magic != TRACK_FILE_MAGIC:
+                raise ValueError("Not a GutterTrack track file")
+            if version != TRACK_FILE_VERSION:
+                raise ValueError(f"Unsupported track file version: {version}")
+            
+            check_track_dimensions(width, depth, lane_width)
+            track = cls(width=width, depth=depth, lane_width=lane_width)
+            store = track.store
+            
+            offset = TRACK_FILE_HEADER.size
+            for name in TRACK_FILE_COLUMNS:
+                column = store._columns[name]
+                end = offset + count * column.itemsize
+                if end > len(view):
+                    raise ValueError("Track file is truncated")
+                column.frombytes(view[offset:end])
+                if sys.byteorder == "big" and column.itemsize > 1:
+                    column.byteswap()
+                offset = end
+        
+        if count and max(store.types) >= len(PIECE_TYPES):
+            raise ValueError("Track file contains an unknown piece type")
+        
+        store.ids.extend(range(count))
+        store._slots.extend(range(count))
+        
+        # Index the rows, dropping any that wouldn't have been placeable
+        # (out of bounds or overlapping), just like from_dict does
+        rejected = []
+        lengths = store.lengths
+        fits = track.occupancy.fits(
+            track._piece_cells(piece_id) if track.fits_length(lengths[piece_id]) else ()
+            for piece_id in range(count)
+        )
+        for piece_id, fit in zip(range(count), fits):
+            if fit and track.fits_length(lengths[piece_id]):
+                track._index_piece(piece_id)
+            else:
+                rejected.append(piece_id)
+        
+        for piece_id in rejected:
+            store.remove(piece_id)
+        
+        return track
 
 class BillOfMaterials:
     def __init__(self, track):
         self.track = track
     
     def calculate(self):
-        """Calculate the bill of materials based on the pieces in the track"""
+        """Return the bill of materials kept up to date by the track's tally"""
+        return self.track.materials.snapshot()
+    
+    def recount(self):
+        """Calculate the bill of materials by walking every piece in the track"""
         # Initialize counters
-        straight_feet = 0
+        straight_units = 0
         elbows_22_5 = 0
         elbows_45 = 0
         elbows_90 = 0
@@ -172,9 +1511,7 @@ class BillOfMaterials:
         # Count pieces
         for piece in self.track.pieces:
             if piece.type == PieceType.STRAIGHT:
-                # Convert to feet (lane width is in inches)
-                piece_length_feet = (piece.length * self.track.lane_width) / 12
-                straight_feet += piece_length_feet
+                straight_units += piece.length
             elif piece.type == PieceType.ELBOW_22_5:
                 elbows_22_5 += 1
             elif piece.type == PieceType.ELBOW_45:
@@ -184,18 +1521,24 @@ class BillOfMaterials:
             elif piece.type == PieceType.T_JUNCTION:
                 t_junctions += 1
         
-        # Calculate connectors and screws
-        # This is a simplified calculation - in reality, it would depend on the specific connections
-        total_pieces = len(self.track.pieces)
-        connectors = max(0, total_pieces - 1)
+        # Calculate connectors and screws: one connector per pair of facing ports
+        mated_ports = 0
+        for piece in self.track.pieces:
+            for (cell_x, cell_y), (dx, dy) in piece.get_ports(self.track.lane_width):
+                neighbour = self.track.piece_at_position(cell_x + dx, cell_y + dy)
+                if neighbour is None or neighbour is piece:
+                    continue
+                if ((cell_x + dx, cell_y + dy), (-dx, -dy)) in neighbour.get_ports(self.track.lane_width):
+                    mated_ports += 1
+        connectors = mated_ports // 2
         screws = connectors * 2  # Assuming each connector needs two screws
         
         return {
-            "straight_feet": round(straight_feet, 2),
+            "straight_feet": straight_feet(straight_units, self.track.lane_width),
             "elbows_22_5": elbows_22_5,
             "elbows_45": elbows_45,
             "elbows_90": elbows_90,
             "t_junctions": t_junctions,
             "connectors": connectors,
             "screws": screws
-        }
\ No newline at end of file
+        }
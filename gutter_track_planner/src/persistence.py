@@ -1,8 +1,11 @@
 import json
 import os
-import shutil
 import datetime
-import asyncio
+import base64
+import hashlib
+import mmap
+import threading
+import time
 from pathlib import Path
 
 # For PWA local storage compatibility
@@ -12,6 +15,58 @@ try:
 except ImportError:
     IS_WEB = False
 
+# Track file formats: JSON and the compact binary format from Track.to_bytes
+TRACK_FILE_EXTENSIONS = ('.json', '.gtrk')
+BINARY_TRACK_EXTENSION = '.gtrk'
+
+def _atomic_write(path, data):
+    """
+    Write a file so readers only ever see the old or the new contents
+    
+    The data goes to a temp file in the same directory, is fsynced, and
+    then renamed over the target.
+    """
+    import tempfile  # Imported here to keep the core modules quick to import
+    
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".part")
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    
+    # Make the rename itself durable
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def read_track_file(file_path):
+    """Load a Track from a JSON or binary (.gtrk) track file, chosen by extension"""
+    from models import Track  # Import here to avoid circular imports
+    
+    if not str(file_path).endswith(BINARY_TRACK_EXTENSION):
+        with open(file_path, 'r') as f:
+            return Track.from_dict(json.loads(f.read()))
+    
+    # Binary tracks are mapped rather than read, so the columns are
+    # copied out of the page cache once
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Track file is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return Track.from_bytes(mapped)
+
 class TrackStorage:
     """Handles track storage for both local and web environments"""
     
@@ -33,34 +88,46 @@ class TrackStorage:
                 self.data_dir = os.path.expanduser(f'~/.{app_name.lower()}')
             
             os.makedirs(self.data_dir, exist_ok=True)
+            
+            # The manifest lives in a subdirectory so rewriting it doesn't
+            # change the mtime of the track directory it describes
+            self.index_dir = os.path.join(self.data_dir, ".index")
+            self.manifest_path = os.path.join(self.index_dir, "manifest.json")
+        
+        self.manifest_key = f"{self.app_name}_manifest"
+        self.version_key = f"{self.app_name}_tracks_version"
     
     def save_track(self, track, filename=None):
-        """Save track to storage"""
+        """Save track to storage (binary if the filename ends in .gtrk, JSON otherwise)"""
         try:
-            # Convert track to JSON
-            track_data = track.to_dict()
-            track_json = json.dumps(track_data)
-            
             if filename is None:
                 # Generate a default filename if none provided
                 timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"track_{timestamp}.json"
-            elif not filename.endswith('.json'):
+            elif not filename.endswith(TRACK_FILE_EXTENSIONS):
                 filename += '.json'
             
+            # Serialize the track
+            if filename.endswith(BINARY_TRACK_EXTENSION):
+                track_data = track.to_bytes()
+            else:
+                track_data = json.dumps(track.to_dict())
+            
             if self.storage_type == "web":
-                # Save to localStorage
+                # Save to localStorage (binary tracks as base64 text)
                 key = f"{self.app_name}_track_{filename}"
                 try:
-                    localStorage.setItem(key, track_json)
+                    localStorage.setItem(key, self._to_text(track_data))
                 except Exception as e:
                     print(f"Error saving to localStorage: {e}")
                     return False, str(e)
+                self._bump_version()
             else:
                 # Save to file
                 file_path = os.path.join(self.data_dir, filename)
-                with open(file_path, 'w') as f:
-                    f.write(track_json)
+                _atomic_write(file_path, track_data)
+            
+            self._update_manifest(filename, track_data, track)
             
             return True, filename
         except Exception as e:
@@ -69,67 +136,52 @@ class TrackStorage:
     def load_track(self, filename):
         """Load track from storage"""
         try:
-            from models import Track
-            
             if self.storage_type == "web":
                 # Load from localStorage
                 key = f"{self.app_name}_track_{filename}"
-                track_json = localStorage.getItem(key)
-                if not track_json:
+                track_text = localStorage.getItem(key)
+                if not track_text:
                     return False, f"Track '{filename}' not found"
+                
+                track_data = self._from_text(filename, track_text)
+                track = self._decode_track(filename, track_data)
             else:
                 # Load from file
                 file_path = os.path.join(self.data_dir, filename)
                 if not os.path.exists(file_path):
                     return False, f"File not found: {file_path}"
                 
-                with open(file_path, 'r') as f:
-                    track_json = f.read()
+                track_data = None
+                track = read_track_file(file_path)
             
-            # Convert JSON to Track object
-            track_data = json.loads(track_json)
-            track = Track.from_dict(track_data)
+            try:
+                self._refresh_entry(filename, track, track_data)
+            except Exception as e:
+                print(f"Error updating the track manifest: {e}")
             
             return True, track
         except Exception as e:
             return False, str(e)
     
-    def list_tracks(self):
-        """List all saved tracks"""
+    def list_tracks(self, refresh=False):
+        """
+        List all saved tracks, newest first, from the manifest
+        
+        Only the storage marker is checked, so tracks added or removed are
+        picked up but one rewritten in place is only noticed when it's next
+        loaded. Pass refresh=True to check every entry against its track.
+        """
         tracks = []
         
         try:
-            if self.storage_type == "web":
-                # List tracks from localStorage
-                for i in range(localStorage.length):
-                    key = localStorage.key(i)
-                    if key and key.startswith(f"{self.app_name}_track_"):
-                        filename = key.replace(f"{self.app_name}_track_", "")
-                        # Extract timestamp from filename if possible
-                        try:
-                            if "_" in filename:
-                                date_part = filename.split("_")[1].split(".")[0]
-                                date = datetime.datetime.strptime(date_part, "%Y%m%d%H%M%S")
-                            else:
-                                date = datetime.datetime.now()
-                        except:
-                            date = datetime.datetime.now()
-                        
-                        tracks.append({
-                            'name': filename,
-                            'path': key,
-                            'date': date.timestamp()
-                        })
-            else:
-                # List tracks from file system
-                for filename in os.listdir(self.data_dir):
-                    if filename.endswith('.json'):
-                        file_path = os.path.join(self.data_dir, filename)
-                        tracks.append({
-                            'name': filename,
-                            'path': file_path,
-                            'date': os.path.getmtime(file_path)
-                        })
+            manifest = self._current_manifest(refresh)
+            
+            for filename, entry in manifest["tracks"].items():
+                if self.storage_type == "web":
+                    path = f"{self.app_name}_track_{filename}"
+                else:
+                    path = os.path.join(self.data_dir, filename)
+                tracks.append(dict(entry, name=filename, path=path))
             
             # Sort by date (newest first)
             tracks.sort(key=lambda x: x['date'], reverse=True)
@@ -145,6 +197,7 @@ class TrackStorage:
                 # Delete from localStorage
                 key = f"{self.app_name}_track_{filename}"
                 localStorage.removeItem(key)
+                self._bump_version()
             else:
                 # Delete from file system
                 file_path = os.path.join(self.data_dir, filename)
@@ -153,10 +206,43 @@ class TrackStorage:
                 else:
                     return False, f"File not found: {file_path}"
             
+            manifest = self._load_manifest()
+            manifest["tracks"].pop(filename, None)
+            self._save_manifest(manifest)
+            
             return True, f"Deleted track: {filename}"
         except Exception as e:
             return False, str(e)
     
+    def find_duplicates(self, refresh=False):
+        """
+        Group saved tracks that contain the same layout
+        
+        Uses the layout hash in the manifest, so tracks match even if they
+        were saved in different formats or with pieces in a different order.
+        Returns a list of filename lists, one per layout saved more than once.
+        Pass refresh=True to check every entry first, as for list_tracks.
+        """
+        manifest = self._current_manifest(refresh)
+        
+        # Manifests written before layout hashes existed are filled in once
+        updated = False
+        for filename, entry in manifest["tracks"].items():
+            if "layout_hash" not in entry:
+                success, track = self.load_track(filename)
+                if success:
+                    entry["layout_hash"] = track.content_hash()
+                    updated = True
+        if updated:
+            self._save_manifest(manifest)
+        
+        groups = {}
+        for filename, entry in manifest["tracks"].items():
+            if "layout_hash" in entry:
+                groups.setdefault(entry["layout_hash"], []).append(filename)
+        
+        return [sorted(names) for names in groups.values() if len(names) > 1]
+    
     def export_track(self, track, export_path):
         """Export track to a specific location"""
         try:
@@ -169,8 +255,7 @@ class TrackStorage:
                 export_path += '.json'
             
             # Write to file
-            with open(export_path, 'w') as f:
-                f.write(track_json)
+            _atomic_write(export_path, track_json)
             
             return True, export_path
         except Exception as e:
@@ -179,15 +264,8 @@ class TrackStorage:
     def import_track(self, import_path):
         """Import track from a specific location"""
         try:
-            from models import Track
-            
             # Read file
-            with open(import_path, 'r') as f:
-                track_json = f.read()
-            
-            # Convert JSON to Track object
-            track_data = json.loads(track_json)
-            track = Track.from_dict(track_data)
+            track = read_track_file(import_path)
             
             # Also save to default storage
             filename = os.path.basename(import_path)
@@ -197,66 +275,528 @@ class TrackStorage:
         except Exception as e:
             return False, str(e)
     
-    def backup_all_tracks(self, backup_dir):
-        """Backup all tracks to a directory"""
+    def backup_all_tracks(self, backup_dir, max_workers=4):
+        """
+        Incrementally back up all tracks to a directory
+        
+        Track contents are stored once each under objects/, named by their
+        SHA-256, and every run writes a snapshot under snapshots/ mapping
+        track names to hashes. Tracks whose content is already backed up
+        cost nothing but a stat, and new objects are written in a thread pool.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
         try:
-            if self.storage_type == "web":
-                # For web storage, export each track to the backup directory
-                success_count = 0
-                for track_info in self.list_tracks():
-                    success, track = self.load_track(track_info['name'])
-                    if success:
-                        backup_path = os.path.join(backup_dir, track_info['name'])
-                        success, _ = self.export_track(track, backup_path)
-                        if success:
-                            success_count += 1
+            objects_dir = os.path.join(backup_dir, "objects")
+            snapshots_dir = os.path.join(backup_dir, "snapshots")
+            os.makedirs(objects_dir, exist_ok=True)
+            os.makedirs(snapshots_dir, exist_ok=True)
+            
+            existing = set(os.listdir(objects_dir))
+            snapshot = {}
+            pending = {}
+            
+            for track_info in self.list_tracks():
+                filename = track_info['name']
+                track_hash = track_info['hash']
                 
-                return True, f"Backed up {success_count} tracks"
-            else:
-                # For file storage, just copy all files
-                os.makedirs(backup_dir, exist_ok=True)
+                # The manifest hash is trusted while the file looks unchanged
+                if self.storage_type != "web":
+                    stat = os.stat(track_info['path'])
+                    if stat.st_size != track_info['size'] or stat.st_mtime != track_info['date']:
+                        track_hash = None
                 
-                copied = 0
-                for filename in os.listdir(self.data_dir):
-                    if filename.endswith('.json'):
-                        src = os.path.join(self.data_dir, filename)
-                        dst = os.path.join(backup_dir, filename)
-                        shutil.copy2(src, dst)
-                        copied += 1
+                if track_hash is None or track_hash not in existing:
+                    pending[filename] = track_info['path']
                 
-                return True, f"Backed up {copied} tracks"
+                snapshot[filename] = {
+                    "hash": track_hash,
+                    "size": track_info['size'],
+                    "date": track_info['date']
+                }
+            
+            # Copy new content in parallel, hashing what is actually read
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(
+                    lambda item: self._backup_object(item[0], item[1], objects_dir),
+                    pending.items()
+                )
+                for filename, (track_hash, size) in zip(pending, results):
+                    snapshot[filename]["hash"] = track_hash
+                    snapshot[filename]["size"] = size
+            
+            snapshot_name = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f") + ".json"
+            _atomic_write(
+                os.path.join(snapshots_dir, snapshot_name),
+                json.dumps({"created": time.time(), "tracks": snapshot}, indent=2)
+            )
+            
+            new_objects = len(set(os.listdir(objects_dir)) - existing)
+            return True, f"Backed up {len(snapshot)} tracks ({new_objects} new)"
         except Exception as e:
             return False, str(e)
+    
+    def _backup_object(self, filename, path, objects_dir):
+        """Store one track's content under its hash, returning (hash, size)"""
+        if self.storage_type == "web":
+            track_data = self._from_text(filename, localStorage.getItem(path))
+            if isinstance(track_data, str):
+                track_data = track_data.encode()
+        else:
+            with open(path, 'rb') as f:
+                track_data = f.read()
+        
+        track_hash = hashlib.sha256(track_data).hexdigest()
+        object_path = os.path.join(objects_dir, track_hash)
+        if not os.path.exists(object_path):
+            _atomic_write(object_path, track_data)
+        return track_hash, len(track_data)
+
+    def _load_manifest(self):
+        """Read the manifest, or an empty one if there is none yet"""
+        try:
+            if self.storage_type == "web":
+                manifest_json = localStorage.getItem(self.manifest_key)
+            else:
+                with open(self.manifest_path, 'r') as f:
+                    manifest_json = f.read()
+            manifest = json.loads(manifest_json)
+            if isinstance(manifest.get("tracks"), dict):
+                return manifest
+        except Exception:
+            pass
+        
+        return {"version": 1, "marker": None, "tracks": {}}
+    
+    def _save_manifest(self, manifest):
+        manifest["marker"] = self._storage_marker()
+        manifest_json = json.dumps(manifest)
+        
+        if self.storage_type == "web":
+            localStorage.setItem(self.manifest_key, manifest_json)
+        else:
+            os.makedirs(self.index_dir, exist_ok=True)
+            _atomic_write(self.manifest_path, manifest_json)
+    
+    def _storage_marker(self):
+        """
+        Cheap fingerprint of the track storage used to detect drift
+        
+        On disk this is the directory mtime, which changes whenever a track
+        file is added, removed or renamed. In the browser it is the version
+        stamp bumped by every track write, so other users of localStorage
+        (like LocalStorageCache) don't count and no keys need walking.
+        """
+        if self.storage_type == "web":
+            return localStorage.getItem(self.version_key)
+        return os.stat(self.data_dir).st_mtime_ns
+    
+    def _bump_version(self):
+        version = localStorage.getItem(self.version_key)
+        localStorage.setItem(self.version_key, str(int(version or 0) + 1))
+    
+    def _manifest_drifted(self, manifest):
+        """Check whether tracks were added or removed since the manifest was saved"""
+        return manifest.get("marker") != self._storage_marker()
+    
+    def _current_manifest(self, refresh=False):
+        """Load the manifest, reconciling it if it drifted or a refresh was asked for"""
+        manifest = self._load_manifest()
+        if refresh or self._manifest_drifted(manifest):
+            manifest = self._reconcile_manifest(manifest)
+        return manifest
+    
+    def _refresh_entry(self, filename, track, track_data=None):
+        """
+        Bring one manifest entry in line with a track that was just loaded
+        
+        A track rewritten in place doesn't move the storage marker, so this
+        is where it gets noticed. On disk the entry is checked against the
+        file's size and mtime; in the browser, against the hash of its text.
+        """
+        manifest = self._load_manifest()
+        if self._manifest_drifted(manifest):
+            # Saving would stamp the current marker over the other changes
+            self._reconcile_manifest(manifest)
+            return
+        
+        entry = manifest["tracks"].get(filename)
+        date = None
+        if self.storage_type == "web":
+            encoded = track_data.encode() if isinstance(track_data, str) else track_data
+            if entry and entry["hash"] == hashlib.sha256(encoded).hexdigest():
+                return
+        else:
+            file_path = os.path.join(self.data_dir, filename)
+            stat = os.stat(file_path)
+            if entry and entry["size"] == stat.st_size and entry["date"] == stat.st_mtime:
+                return
+            with open(file_path, 'rb') as f:
+                track_data = f.read()
+            date = stat.st_mtime
+        
+        manifest["tracks"][filename] = self._manifest_entry(filename, track_data, track, date)
+        self._save_manifest(manifest)
+    
+    def _decode_track(self, filename, track_data):
+        """Create a Track from stored JSON text or binary data"""
+        from models import Track
+        
+        if filename.endswith(BINARY_TRACK_EXTENSION):
+            return Track.from_bytes(track_data)
+        return Track.from_dict(json.loads(track_data))
+    
+    def _to_text(self, track_data):
+        if isinstance(track_data, bytes):
+            return base64.b64encode(track_data).decode()
+        return track_data
+    
+    def _from_text(self, filename, track_text):
+        if filename.endswith(BINARY_TRACK_EXTENSION):
+            return base64.b64decode(track_text)
+        return track_text
+    
+    def _manifest_entry(self, filename, track_data, track=None, date=None):
+        """Build the manifest record for a stored track"""
+        from models import BillOfMaterials
+        
+        if track is None:
+            track = self._decode_track(filename, track_data)
+        
+        encoded = track_data.encode() if isinstance(track_data, str) else track_data
+        return {
+            "size": len(encoded),
+            "date": date if date is not None else datetime.datetime.now().timestamp(),
+            "hash": hashlib.sha256(encoded).hexdigest(),
+            "layout_hash": track.content_hash(),
+            "width": track.width,
+            "depth": track.depth,
+            "lane_width": track.lane_width,
+            "pieces": len(track.store),
+            "bom": BillOfMaterials(track).calculate()
+        }
+    
+    def _update_manifest(self, filename, track_data, track):
+        """Record a just-saved track in the manifest"""
+        manifest = self._load_manifest()
+        date = None
+        if self.storage_type != "web":
+            date = os.path.getmtime(os.path.join(self.data_dir, filename))
+        manifest["tracks"][filename] = self._manifest_entry(filename, track_data, track, date)
+        self._save_manifest(manifest)
+    
+    def _reconcile_manifest(self, manifest):
+        """Bring the manifest back in line with what is actually stored"""
+        tracks = manifest["tracks"]
+        found = set()
+        
+        if self.storage_type == "web":
+            prefix = f"{self.app_name}_track_"
+            for i in range(localStorage.length):
+                key = localStorage.key(i)
+                if key and key.startswith(prefix):
+                    filename = key[len(prefix):]
+                    found.add(filename)
+                    try:
+                        # There's no mtime to go by, so entries are checked by hash
+                        track_data = self._from_text(filename, localStorage.getItem(key))
+                        encoded = track_data.encode() if isinstance(track_data, str) else track_data
+                        entry = tracks.get(filename)
+                        if entry and entry["hash"] == hashlib.sha256(encoded).hexdigest():
+                            continue
+                        tracks[filename] = self._manifest_entry(filename, track_data)
+                    except Exception:
+                        tracks.pop(filename, None)
+                        found.discard(filename)
+        else:
+            for filename in os.listdir(self.data_dir):
+                if not filename.endswith(TRACK_FILE_EXTENSIONS):
+                    continue
+                
+                file_path = os.path.join(self.data_dir, filename)
+                stat = os.stat(file_path)
+                found.add(filename)
+                entry = tracks.get(filename)
+                if entry and entry["size"] == stat.st_size and entry["date"] == stat.st_mtime:
+                    continue
+                
+                try:
+                    mode = 'rb' if filename.endswith(BINARY_TRACK_EXTENSION) else 'r'
+                    with open(file_path, mode) as f:
+                        tracks[filename] = self._manifest_entry(filename, f.read(), date=stat.st_mtime)
+                except Exception:
+                    # Unreadable files are left out of the listing
+                    tracks.pop(filename, None)
+                    found.discard(filename)
+        
+        for filename in list(tracks):
+            if filename not in found:
+                del tracks[filename]
+        
+        self._save_manifest(manifest)
+        return manifest
+
+class AutosaveService:
+    """
+    Debounced background autosave for the track being edited
+    
+    schedule() only takes a binary snapshot of the track; bursts of edits within `delay`
+    seconds are coalesced into one write, which happens on a worker thread
+    (or a loop callback in the browser, where there are no threads). The
+    last `generations` autosaves are kept so a bad write can be rolled back.
+    """
+    
+    def __init__(self, storage, name="autosave", delay=2.0, generations=3):
+        self.storage = storage
+        self.name = name
+        self.delay = delay
+        self.generations = max(1, generations)
+        self.last_error = None
+        
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._deadline = 0.0
+        self._stopped = False
+        self._thread = None
+        self._timer = None
+        
+        if storage.storage_type != "web":
+            self.autosave_dir = os.path.join(storage.data_dir, ".autosave")
+    
+    def schedule(self, track):
+        """Queue a snapshot of the track to be saved after the debounce delay"""
+        # Snapshot on the caller's thread so later edits can't race the writer.
+        # to_bytes() is a few column copies; the JSON encoding happens in _write
+        track_data = track.to_bytes()
+        
+        if self.storage.storage_type == "web":
+            import asyncio  # Only needed in the browser, and slow to import
+            
+            self._pending = track_data
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = asyncio.get_event_loop().call_later(self.delay, self.flush)
+            return
+        
+        with self._condition:
+            self._pending = track_data
+            self._deadline = time.monotonic() + self.delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+    
+    def flush(self):
+        """Write any pending snapshot now"""
+        with self._condition:
+            track_data = self._pending
+            self._pending = None
+        
+        if track_data is not None:
+            self._write(track_data)
+    
+    def stop(self):
+        """Flush pending changes and shut the worker down"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+    
+    def restore(self):
+        """Load the newest autosave generation that can be read"""
+        from models import Track  # Import here to avoid circular imports
+        
+        for generation in range(self.generations):
+            try:
+                track_json = self._read_generation(generation)
+                if track_json:
+                    return True, Track.from_dict(json.loads(track_json))
+            except Exception:
+                continue
+        
+        return False, "No autosave found"
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (
+                        self._pending is None or self._deadline > time.monotonic()):
+                    timeout = None
+                    if self._pending is not None:
+                        timeout = self._deadline - time.monotonic()
+                    self._condition.wait(timeout)
+                
+                if self._pending is None:
+                    return
+                track_data = self._pending
+                self._pending = None
+            
+            self._write(track_data)
+    
+    def _write(self, track_data):
+        from models import Track  # Import here to avoid circular imports
+        
+        with self._write_lock:
+            try:
+                track_json = json.dumps(Track.from_bytes(track_data).to_dict())
+                
+                # Shift older generations down, dropping the oldest
+                for generation in range(self.generations - 1, 0, -1):
+                    self._move_generation(generation - 1, generation)
+                
+                if self.storage.storage_type == "web":
+                    localStorage.setItem(self._generation_key(0), track_json)
+                else:
+                    os.makedirs(self.autosave_dir, exist_ok=True)
+                    _atomic_write(self._generation_path(0), track_json)
+                
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error autosaving track: {e}")
+    
+    def _generation_key(self, generation):
+        return f"{self.storage.app_name}_autosave_{self.name}_{generation}"
+    
+    def _generation_path(self, generation):
+        suffix = f".{generation}" if generation else ""
+        return os.path.join(self.autosave_dir, f"{self.name}{suffix}.json")
+    
+    def _read_generation(self, generation):
+        if self.storage.storage_type == "web":
+            return localStorage.getItem(self._generation_key(generation))
+        
+        with open(self._generation_path(generation), 'r') as f:
+            return f.read()
+    
+    def _move_generation(self, source, target):
+        if self.storage.storage_type == "web":
+            value = localStorage.getItem(self._generation_key(source))
+            if value is not None:
+                localStorage.setItem(self._generation_key(target), value)
+        elif os.path.exists(self._generation_path(source)):
+            os.replace(self._generation_path(source), self._generation_path(target))
+
+class QuotaExceededError(Exception):
+    """Raised by MemoryStorage when a write would go over its quota"""
+
+# Names browsers give the DOMException thrown when localStorage is full
+QUOTA_ERROR_NAMES = ("QuotaExceededError", "NS_ERROR_DOM_QUOTA_REACHED")
+
+def _is_quota_error(error):
+    """Check whether a storage write failed because storage is full"""
+    if isinstance(error, QuotaExceededError):
+        return True
+    name = getattr(error, "name", None) or type(error).__name__
+    return name in QUOTA_ERROR_NAMES or any(quota_name in str(error) for quota_name in QUOTA_ERROR_NAMES)
+
+class MemoryStorage:
+    """
+    In-memory stand-in for the browser's localStorage
+    
+    Offers the same methods (getItem, setItem, removeItem, key, length) so
+    LocalStorageCache works outside the browser. Like localStorage, the
+    quota is counted in UTF-16 code units, two bytes each.
+    """
+    def __init__(self, quota_bytes=5 * 1024 * 1024):
+        self.quota_bytes = quota_bytes
+        self._items = {}
+        self._used = 0
+    
+    @property
+    def length(self):
+        return len(self._items)
+    
+    def key(self, index):
+        if 0 <= index < len(self._items):
+            return list(self._items)[index]
+        return None
+    
+    def getItem(self, key):
+        return self._items.get(key)
+    
+    def setItem(self, key, value):
+        value = str(value)
+        old = self._items.get(key)
+        used = self._used + 2 * (len(key) + len(value))
+        if old is not None:
+            used -= 2 * (len(key) + len(old))
+        if self.quota_bytes is not None and used > self.quota_bytes:
+            raise QuotaExceededError(f"Storage quota of {self.quota_bytes} bytes exceeded")
+        self._items[key] = value
+        self._used = used
+    
+    def removeItem(self, key):
+        value = self._items.pop(key, None)
+        if value is not None:
+            self._used -= 2 * (len(key) + len(value))
+    
+    def clear(self):
+        self._items.clear()
+        self._used = 0
 
 # For web environments, create a wrapper for localStorage to use in cache
 class LocalStorageCache:
-    """Cache wrapper for localStorage"""
-    def __init__(self, prefix="GutterTrack_cache_"):
+    """
+    Cache wrapper for localStorage
+    
+    Entries are tracked in an index kept next to them in storage, ordered
+    from least to most recently used, with each entry's size and expiry.
+    Expired entries are never returned, and the least recently used ones
+    are evicted to stay under max_bytes or when storage reports it is full;
+    other storage errors are passed on without evicting anything. Outside
+    the browser an in-memory backend is used.
+    """
+    def __init__(self, prefix="GutterTrack_cache_", backend=None, max_bytes=2 * 1024 * 1024):
         self.prefix = prefix
+        if backend is None:
+            backend = localStorage if IS_WEB else MemoryStorage()
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.index_key = f"{prefix}__index__"
+        self._index = self._load_index()
+        self._used = sum(size for size, _ in self._index.values())
     
     def get(self, key):
         """Get item from cache"""
-        if not IS_WEB:
-            return None
-        
         try:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            
             full_key = f"{self.prefix}{key}"
-            value = localStorage.getItem(full_key)
-            if value:
-                # Check if it's JSON
-                try:
-                    return json.loads(value)
-                except:
-                    return value
-            return None
+            if self._expired(entry):
+                self._drop(key)
+                self._save_index()
+                return None
+            
+            value = self.backend.getItem(full_key)
+            if value is None:
+                # Removed behind our back
+                self._drop(key)
+                self._save_index()
+                return None
+            
+            # Mark as most recently used, keeping the order across reloads
+            if next(reversed(self._index)) != key:
+                self._index[key] = self._index.pop(key)
+                self._save_index()
+            
+            # Check if it's JSON
+            try:
+                return json.loads(value)
+            except:
+                return value
         except:
             return None
     
     def set(self, key, value, expiry_seconds=None):
         """Set item in cache with optional expiry"""
-        if not IS_WEB:
-            return False
-        
         try:
             full_key = f"{self.prefix}{key}"
             
@@ -264,51 +804,137 @@ class LocalStorageCache:
             if not isinstance(value, str):
                 value = json.dumps(value)
             
-            # If expiry is set, create a wrapper object with expiry timestamp
-            if expiry_seconds:
-                expiry = datetime.datetime.now() + datetime.timedelta(seconds=expiry_seconds)
-                wrapper = {
-                    "value": value,
-                    "expiry": expiry.timestamp()
-                }
-                localStorage.setItem(full_key, json.dumps(wrapper))
-            else:
-                localStorage.setItem(full_key, value)
+            size = self._entry_size(full_key, value)
+            if size > self.max_bytes:
+                return False
             
+            expiry = time.time() + expiry_seconds if expiry_seconds else None
+            
+            # Make room within the budget, expired entries first
+            if key in self._index:
+                self._drop(key)
+            self._purge_expired()
+            while self._index and self._used + size > self.max_bytes:
+                self._drop(next(iter(self._index)))
+            
+            if not self._write(full_key, value):
+                self._save_index()
+                return False
+            
+            self._index[key] = [size, expiry]
+            self._used += size
+            self._save_index()
             return True
-        except:
+        except Exception as e:
+            print(f"Error writing to cache: {e}")
             return False
     
     def delete(self, key):
         """Delete item from cache"""
-        if not IS_WEB:
-            return False
-        
         try:
-            full_key = f"{self.prefix}{key}"
-            localStorage.removeItem(full_key)
+            if key in self._index:
+                self._drop(key)
+                self._save_index()
+            else:
+                self.backend.removeItem(f"{self.prefix}{key}")
             return True
         except:
             return False
     
     def clear(self):
         """Clear all items from cache with this prefix"""
-        if not IS_WEB:
+        try:
+            for key in list(self._index):
+                self._drop(key)
+            self.backend.removeItem(self.index_key)
+            return True
+        except:
             return False
-        
+    
+    def purge_expired(self):
+        """Remove every expired entry, returning how many were removed"""
+        removed = self._purge_expired()
+        if removed:
+            self._save_index()
+        return removed
+    
+    def _entry_size(self, full_key, value):
+        # localStorage counts UTF-16 code units
+        return 2 * (len(full_key) + len(value))
+    
+    def _expired(self, entry):
+        expiry = entry[1]
+        return expiry is not None and expiry <= time.time()
+    
+    def _purge_expired(self):
+        expired = [key for key, entry in self._index.items() if self._expired(entry)]
+        for key in expired:
+            self._drop(key)
+        return len(expired)
+    
+    def _drop(self, key):
+        size, _ = self._index.pop(key)
+        self._used -= size
+        self.backend.removeItem(f"{self.prefix}{key}")
+    
+    def _write(self, storage_key, value):
+        """Write to storage, evicting least recently used entries while it's full"""
+        while True:
+            try:
+                self.backend.setItem(storage_key, value)
+                return True
+            except Exception as e:
+                if not _is_quota_error(e):
+                    raise
+                if not self._index:
+                    return False
+                self._drop(next(iter(self._index)))
+    
+    def _save_index(self):
+        while True:
+            try:
+                self.backend.setItem(self.index_key, json.dumps(self._index))
+                return
+            except Exception as e:
+                if not _is_quota_error(e):
+                    print(f"Error saving cache index: {e}")
+                    return
+                if not self._index:
+                    return
+                self._drop(next(iter(self._index)))
+    
+    def _load_index(self):
+        """Read the index, rebuilding it from a key scan if it is missing"""
         try:
-            keys_to_remove = []
-            
-            # Find all keys with our prefix
-            for i in range(localStorage.length):
-                key = localStorage.key(i)
-                if key and key.startswith(self.prefix):
-                    keys_to_remove.append(key)
+            index_json = self.backend.getItem(self.index_key)
+            if index_json:
+                return json.loads(index_json)
+        except Exception:
+            pass
+        
+        # First run, or entries written before there was an index: scan once
+        index = {}
+        for i in range(self.backend.length):
+            full_key = self.backend.key(i)
+            if not full_key or not full_key.startswith(self.prefix) or full_key == self.index_key:
+                continue
+            index[full_key[len(self.prefix):]] = [0, None]
+        
+        for key in index:
+            full_key = f"{self.prefix}{key}"
+            value = self.backend.getItem(full_key)
             
-            # Remove all found keys
-            for key in keys_to_remove:
-                localStorage.removeItem(key)
+            # Unwrap old {"value", "expiry"} entries into the index
+            expiry = None
+            try:
+                wrapper = json.loads(value)
+                if isinstance(wrapper, dict) and set(wrapper) == {"value", "expiry"}:
+                    value = wrapper["value"]
+                    expiry = wrapper["expiry"]
+                    self.backend.setItem(full_key, value)
+            except Exception:
+                pass
             
-            return True
-        except:
-            return False
\ No newline at end of file
+            index[key] = [self._entry_size(full_key, value), expiry]
+        
+        return index
@@ -0,0 +1,342 @@
+"""
+Local HTTP service for the BOM API
+
+A small asyncio HTTP/1.1 server built on the standard library:
+
+    POST /bom            track JSON -> BomCalculator.calculate_bom
+    POST /validate       track JSON -> BomCalculator.validate_track
+    POST /assembly-time  track JSON -> BomCalculator.estimate_assembly_time
+    POST /lane-width     track JSON -> BomCalculator.check_lane_width
+    POST /cost           {"bom": ..., "prices": ...} -> calculate_materials_cost
+    GET  /health
+
+Track responses are cached by a hash of the canonical JSON payload, and a
+byte-identical body is answered without being parsed again. Parsing, hashing
+and the track work all run in a single process pool job per request so the
+event loop keeps serving, and the pool is replaced if a worker dies.
+
+    python server.py --port 8765
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import BrokenExecutor
+from api import BomCalculator
+from utils import calculate_materials_cost, validate_dimensions
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+INLINE_HASH_BYTES = 64 * 1024  # Larger bodies are hashed off the event loop
+
+# Endpoints that take a track and run in the worker pool
+TRACK_ENDPOINTS = {
+    "/bom": BomCalculator.calculate_bom,
+    "/validate": BomCalculator.validate_track,
+    "/assembly-time": BomCalculator.estimate_assembly_time,
+    "/lane-width": BomCalculator.check_lane_width
+}
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error"
+}
+
+def payload_hash(payload):
+    """Hash a JSON payload independently of key order and whitespace"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class BomService:
+    """HTTP front end for BomCalculator with an LRU response cache"""
+    
+    def __init__(self, max_workers=None, cache_size=1024):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.executor = None
+        self.hits = 0
+        self.misses = 0
+        
+        # (endpoint, payload hash) -> (status, encoded body) response
+        self._cache = OrderedDict()
+        
+        # (endpoint, raw body hash) -> future of the response. Storing the
+        # future lets identical concurrent requests share one job.
+        self._bodies = OrderedDict()
+    
+    async def handle(self, method, path, body):
+        """Return (status, response body) for a request"""
+        if path == "/health":
+            if method != "GET":
+                return 405, _error("Use GET")
+            return 200, json.dumps({
+                "status": "success",
+                "cache_entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses
+            }).encode()
+        
+        if path != "/cost" and path not in TRACK_ENDPOINTS:
+            return 404, _error(f"Unknown endpoint: {path}")
+        if method != "POST":
+            return 405, _error("Use POST")
+        
+        if path == "/cost":
+            # Uncached; the body still has to be parsed off the loop
+            return await self._run(_run_request, path, body)
+        
+        body_key = (path, await _body_hash(body))
+        future = self._bodies.get(body_key)
+        if future is not None:
+            self.hits += 1
+            self._bodies.move_to_end(body_key)
+        else:
+            future = asyncio.ensure_future(self._run_track(path, body))
+            self._remember(self._bodies, body_key, future)
+        
+        try:
+            return await asyncio.shield(future)
+        except Exception as e:
+            # Don't keep failures around
+            if self._bodies.get(body_key) is future:
+                del self._bodies[body_key]
+            if isinstance(e, BrokenExecutor):
+                raise
+            return 500, _error(str(e))
+    
+    async def _run_track(self, path, body):
+        """
+        Answer a track request with one worker job
+        
+        The job is told which payload hashes already have a response, so it
+        only runs the endpoint when the payload is new.
+        """
+        known = frozenset(digest for endpoint, digest in self._cache if endpoint == path)
+        status, digest, response = await self._run(_run_track_request, path, body, known)
+        if digest is None:
+            return status, response  # Turned away before any track work
+        
+        key = (path, digest)
+        if response is None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return cached
+            # Evicted while the job ran
+            status, digest, response = await self._run(_run_track_request, path, body, frozenset())
+        
+        self.misses += 1
+        self._remember(self._cache, key, (status, response))
+        return status, response
+    
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+    
+    async def _run(self, func, *args):
+        """Run a function in the worker pool, replacing the pool if it broke"""
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenExecutor:
+            # A dead worker (say, killed for running out of memory) breaks the
+            # whole pool for good; later requests get a fresh one
+            if executor is not None and self.executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._new_executor()
+            raise
+    
+    def _new_executor(self):
+        from concurrent.futures import ProcessPoolExecutor
+        
+        return ProcessPoolExecutor(max_workers=self.max_workers or os.cpu_count() or 1)
+    
+    async def handle_client(self, reader, writer):
+        """Serve requests on one connection until it closes"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, _error("Malformed request line"), False)
+                    break
+                
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413 if length > 0 else 400, _error("Bad Content-Length"), False)
+                    break
+                
+                body = await reader.readexactly(length) if length else b""
+                path = target.split("?", 1)[0]
+                
+                try:
+                    status, response = await self.handle(method, path, body)
+                except Exception as e:
+                    status, response = 500, _error(str(e))
+                
+                await self._respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _respond(self, writer, status, body, keep_alive):
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    
+    async def serve(self, host="127.0.0.1", port=8765, ready=None):
+        """Run the service until cancelled"""
+        self.executor = self._new_executor()
+        try:
+            server = await asyncio.start_server(self.handle_client, host, port)
+            async with server:
+                if ready is not None:
+                    ready(server)
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+def _parse(body):
+    """Parse a request body; returns (payload, None) or (None, error response)"""
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        return None, (400, _error(f"Invalid JSON: {e}"))
+    if not isinstance(payload, dict):
+        return None, (400, _error("Expected a JSON object"))
+    return payload, None
+
+def _screen(path, payload):
+    """
+    Return an error message for a track too big to be worth any work, or None
+    
+    Boards over the size limits, more pieces than the board has cells, and
+    straights longer than the board are turned away here, before the track
+    is built; /validate reports all of these itself.
+    """
+    if path == "/validate":
+        return None
+    
+    dimensions = [payload.get(field) for field in ("width", "depth", "lane_width")]
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in dimensions):
+        return None
+    errors = validate_dimensions(*dimensions)
+    if errors:
+        return "Invalid track dimensions: " + "; ".join(errors)
+    
+    pieces = payload.get("pieces")
+    if not isinstance(pieces, list):
+        return None
+    width, depth, lane_width = dimensions
+    grid_width = int(width * 12 / lane_width)
+    grid_height = int(depth * 12 / lane_width)
+    if len(pieces) > grid_width * grid_height:
+        return f"Too many pieces: {len(pieces)} on a board of {grid_width * grid_height} cells"
+    longest = max(grid_width, grid_height)
+    for index, piece in enumerate(pieces, 1):
+        length = piece.get("length") if isinstance(piece, dict) else None
+        if isinstance(length, (int, float)) and length > longest:
+            return f"Piece {index}: Length {length} is longer than the board"
+    return None
+
+def _run_track_request(path, body, known):
+    """
+    Parse, screen and hash a track request in a worker, then run its endpoint
+    
+    Returns:
+        (status, payload hash, JSON-encoded response). The response is None
+        when the hash is in `known`, and the hash is None for a body that
+        was turned away.
+    """
+    payload, failure = _parse(body)
+    if failure is None:
+        message = _screen(path, payload)
+        if message is not None:
+            failure = 400, _error(message)
+    if failure is not None:
+        status, response = failure
+        return status, None, response
+    
+    digest = payload_hash(payload)
+    if digest in known:
+        return 200, digest, None
+    return 200, digest, json.dumps(TRACK_ENDPOINTS[path](payload)).encode()
+
+def _run_request(path, body):
+    """Run the /cost endpoint in a worker; returns (status, JSON-encoded response)"""
+    payload, failure = _parse(body)
+    if failure is not None:
+        return failure
+    
+    try:
+        result = calculate_materials_cost(payload["bom"], payload.get("prices"))
+        return 200, json.dumps({"status": "success", "cost": result}).encode()
+    except Exception as e:
+        return 400, _error(str(e))
+
+async def _body_hash(body):
+    """Hash a raw request body, in a thread when it's big enough to stall the loop"""
+    if len(body) <= INLINE_HASH_BYTES:
+        return _hash_bytes(body)
+    return await asyncio.to_thread(_hash_bytes, body)
+
+def _hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def _error(message):
+    return json.dumps({"status": "error", "message": message}).encode()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the GutterTrack BOM API over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="Worker processes (defaults to the CPU count)")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="Responses kept in the LRU cache")
+    args = parser.parse_args(argv)
+    
+    service = BomService(max_workers=args.workers, cache_size=args.cache_size)
+    
+    def ready(server):
+        for sock in server.sockets:
+            print(f"Serving on {sock.getsockname()}")
+    
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import json
 import os
 import base64
+import struct
+import zlib
+from collections import OrderedDict
 from pathlib import Path
-import flet as ft
 
 def snap_to_grid(value, grid_size):
     """Snap a coordinate value to the nearest grid point"""
@@ -92,48 +94,424 @@ def load_track_from_file(file_path):
 
 def get_saved_tracks():
     """Get a list of saved tracks"""
-    data_dir = get_app_data_dir()
-    tracks = []
+    from persistence import TrackStorage  # Import here to avoid circular imports
     
-    try:
-        for file_name in os.listdir(data_dir):
-            if file_name.endswith('.json'):
-                file_path = os.path.join(data_dir, file_name)
-                tracks.append({
-                    'name': file_name,
-                    'path': file_path,
-                    'date': os.path.getmtime(file_path)
-                })
+    # TrackStorage keeps a manifest of the app data directory, so listing
+    # doesn't have to stat every file
+    return TrackStorage().list_tracks()
+
+# RGB equivalents of the flet colors TrackGrid paints cells with, by piece type value
+PIECE_RGB = {
+    "straight": b"\x90\xca\xf9",     # BLUE_200
+    "elbow_22_5": b"\xc8\xe6\xc9",   # GREEN_100
+    "elbow_45": b"\xa5\xd6\xa7",     # GREEN_200
+    "elbow_90": b"\x66\xbb\x6a",     # GREEN_400
+    "t_junction": b"\xff\xa7\x26"    # ORANGE_400
+}
+EMPTY_CELL_RGB = b"\xff\xff\xff"
+CELL_BORDER_RGB = b"\xbd\xbd\xbd"  # GREY_400
+
+# Rendered tiles keyed by their size and the type plane under them, shared between
+# exports. Tile sizes vary with cell_size and tile_cells, so the cache is capped in bytes
+TILE_CACHE_BYTES = 32 * 1024 * 1024
+_tile_cache = OrderedDict()
+_tile_cache_bytes = 0
+
+def _png_chunk(tag, data):
+    chunk = tag + data
+    return struct.pack(">I", len(data)) + chunk + struct.pack(">I", zlib.crc32(chunk))
+
+def _render_tile(key):
+    """Render a tile to a list of RGB pixel rows"""
+    from models import PIECE_TYPES  # Import here to avoid circular imports
+    
+    cell_size, cols, rows, cells = key
+    
+    # Type plane values are 0 for an empty cell, otherwise the type code + 1
+    colors = [EMPTY_CELL_RGB] + [PIECE_RGB[piece_type.value] for piece_type in PIECE_TYPES]
+    
+    # Every cell is a 1px border around its fill color
+    border_row = CELL_BORDER_RGB * cell_size
+    inner_rows = {}
+    
+    # The edge rows are the same all the way down, so every row shares one
+    edge = border_row * cols
+    
+    pixel_rows = []
+    for row in range(rows):
+        inner = []
+        for col in range(cols):
+            rgb = colors[cells[row * cols + col]]
+            pattern = inner_rows.get(rgb)
+            if pattern is None:
+                pattern = CELL_BORDER_RGB + rgb * (cell_size - 2) + CELL_BORDER_RGB
+                inner_rows[rgb] = pattern
+            inner.append(pattern)
+        inner = b"".join(inner)
         
-        # Sort by date (newest first)
-        tracks.sort(key=lambda x: x['date'], reverse=True)
-        return tracks
-    except Exception:
-        return []
+        pixel_rows.append(edge)
+        pixel_rows.extend([inner] * (cell_size - 2))
+        pixel_rows.append(edge)
+    
+    return pixel_rows
+
+def _tile_bytes(key, tile):
+    """Bytes held by a cached tile: its key's type plane and each distinct pixel row"""
+    rows = {id(row): len(row) for row in tile}
+    return len(key[3]) + sum(rows.values())
+
+def _cached_tile(key):
+    global _tile_cache_bytes
+    
+    entry = _tile_cache.get(key)
+    if entry is not None:
+        _tile_cache.move_to_end(key)
+        return entry[0]
+    
+    tile = _render_tile(key)
+    size = _tile_bytes(key, tile)
+    if size <= TILE_CACHE_BYTES:
+        _tile_cache[key] = (tile, size)
+        _tile_cache_bytes += size
+        while _tile_cache_bytes > TILE_CACHE_BYTES:
+            _, (_, evicted) = _tile_cache.popitem(last=False)
+            _tile_cache_bytes -= evicted
+    return tile
+
+def _png_stream(track, cell_size, tile_cells):
+    """Yield the PNG file for a track piece by piece, one band of tiles at a time"""
+    grid_width = track.grid_width
+    grid_height = track.grid_height
+    occupancy = track.occupancy
+    
+    yield b"\x89PNG\r\n\x1a\n"
+    yield _png_chunk(b"IHDR", struct.pack(
+        ">IIBBBBB", grid_width * cell_size, grid_height * cell_size, 8, 2, 0, 0, 0))
+    
+    compressor = zlib.compressobj(6)
+    for tile_y in range(0, (grid_height + tile_cells - 1) // tile_cells):
+        rows = min(tile_cells, grid_height - tile_y * tile_cells)
+        band = []
+        for tile_x in range(0, (grid_width + tile_cells - 1) // tile_cells):
+            cols = min(tile_cells, grid_width - tile_x * tile_cells)
+            
+            # A tile's content is the slice of the type plane it covers
+            start = tile_x * tile_cells
+            cells = b"".join(
+                occupancy.row(tile_y * tile_cells + row, start, start + cols)
+                for row in range(rows)
+            )
+            band.append(_cached_tile((cell_size, cols, rows, cells)))
+        
+        # Each scanline starts with filter type 0 (none)
+        data = compressor.compress(b"".join(
+            b"\x00" + b"".join(tile[line] for tile in band)
+            for line in range(rows * cell_size)
+        ))
+        if data:
+            yield _png_chunk(b"IDAT", data)
+    
+    yield _png_chunk(b"IDAT", compressor.flush())
+    yield _png_chunk(b"IEND", b"")
+
+def export_track_as_image(track_grid, path=None, cell_size=20, tile_cells=16):
+    """
+    Export track as a PNG image, colored like the track grid
+    
+    Args:
+        track_grid: TrackGrid or Track to render
+        path: File to write the PNG to (optional, returns the bytes if None)
+        cell_size: Size of a grid cell in pixels
+        tile_cells: Width and height of a render tile in grid cells
+    
+    Returns:
+        PNG bytes, or the path written to
+    
+    The board is rendered one band of tiles at a time, so memory stays
+    bounded on huge boards. Tiles are cached by their content, so after a
+    small edit only the tiles it touched are rendered again.
+    """
+    track = getattr(track_grid, "track", track_grid)
+    if cell_size < 3:
+        raise ValueError("cell_size must be at least 3 pixels")
+    
+    chunks = _png_stream(track, cell_size, tile_cells)
+    if path is None:
+        return b"".join(chunks)
+    
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return path
 
-def export_track_as_image(track_grid):
+def export_track_as_svg(track_grid, out, cell_size=20, title=None):
     """
-    Export track as a PNG image (placeholder function)
+    Export track as an SVG build sheet
+    
+    Args:
+        track_grid: TrackGrid or Track to export
+        out: Path or writable text file object
+        cell_size: Size of a grid cell in SVG user units
+        title: Track name written to the sheet's <title>, if any
     
-    In a real implementation, this would use a library to render the grid as an image.
-    Since Flet 0.28.2 doesn't support this directly, this is just a placeholder.
+    Returns:
+        The path or file object written to
+    
+    Pieces are written one at a time as the store is walked, grouped by
+    piece type, so memory use doesn't grow with the size of the layout.
     """
-    # Placeholder - in a real app, would convert the grid to an image
-    return None
+    track = getattr(track_grid, "track", track_grid)
+    
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, 'w', encoding='utf-8') as f:
+            _write_svg(track, f, cell_size, title)
+    else:
+        _write_svg(track, out, cell_size, title)
+    return out
 
-def generate_sharing_url(track):
+def _write_svg(track, out, cell_size, title=None):
+    from html import escape  # Imported here to keep the core modules quick to import
+    from models import PIECE_TYPES, piece_label  # Import here to avoid circular imports
+    
+    write = out.write
+    width = track.grid_width * cell_size
+    height = track.grid_height * cell_size
+    
+    write(
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">\n'
+    )
+    if title:
+        write(f"<title>{escape(title)}</title>\n")
+    
+    # Cell colors match the track grid; empty cells come from a grid pattern
+    write("<style>\n")
+    write(f"rect{{stroke:#{CELL_BORDER_RGB.hex()};stroke-width:1}}\n")
+    write("text{font:bold 10px sans-serif;text-anchor:middle}\n")
+    write(".rotation{font:8px sans-serif;fill-opacity:0.54}\n")
+    for piece_type in PIECE_TYPES:
+        write(f".{piece_type.value} rect{{fill:#{PIECE_RGB[piece_type.value].hex()}}}\n")
+    write("</style>\n")
+    write(
+        f'<defs><pattern id="grid" width="{cell_size}" height="{cell_size}" patternUnits="userSpaceOnUse">'
+        f'<rect width="{cell_size}" height="{cell_size}" fill="#{EMPTY_CELL_RGB.hex()}"/></pattern></defs>\n'
+    )
+    write(f'<rect width="{width}" height="{height}" fill="url(#grid)" stroke="none"/>\n')
+    
+    store = track.store
+    types = store.types
+    for type_code, piece_type in enumerate(PIECE_TYPES):
+        write(f'<g class="{piece_type.value}">\n')
+        
+        for slot in range(len(store)):
+            if types[slot] != type_code:
+                continue
+            
+            piece_id = store.ids[slot]
+            cells = track._piece_cells(piece_id)
+            parts = [
+                f'<rect x="{x * cell_size}" y="{y * cell_size}" width="{cell_size}" height="{cell_size}"/>'
+                for x, y in cells
+            ]
+            
+            # Label the piece on its anchor cell like the grid does
+            center_x = (cells[0][0] + 0.5) * cell_size
+            center_y = (cells[0][1] + 0.5) * cell_size
+            parts.append(
+                f'<text x="{center_x}" y="{center_y}">{piece_label(piece_type, store.lengths[slot])}</text>'
+                f'<text class="rotation" x="{center_x}" y="{center_y + 9}">{store.rotations[slot]}°</text>'
+            )
+            write(f'<g id="piece-{piece_id}">{"".join(parts)}</g>\n')
+        
+        write("</g>\n")
+    
+    write("</svg>\n")
+
+SHARE_URL_BASE = "https://guttertrack.example.com/share/"
+
+# Sharing tokens in the compact format start with this tag; older links
+# are plain base64 JSON, which always starts with "eyJ"
+SHARE_TOKEN_TAG = "g1"
+
+# Most bytes a sharing token may inflate to. The largest board allowed has
+# 360,000 cells and a piece record is at most 23 bytes, so real tokens stay
+# well under this; anything bigger is a decompression bomb
+SHARE_MAX_BYTES = 16 * 1024 * 1024
+
+# Piece record flags in the compact format
+_SHARE_ROTATIONS = (0, 90, 180, 270)
+_SHARE_CUSTOM_ROTATION = 4
+_SHARE_HAS_LENGTH = 0x40
+_SHARE_OFF_GRID = 0x80
+
+def _write_varint(out, value):
+    """Append an unsigned LEB128 varint"""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, pos):
+    """Read an unsigned LEB128 varint, returning (value, new position)"""
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Sharing data is truncated")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+def encode_track(track):
     """
-    Generate a URL for sharing the track (placeholder function)
+    Encode a track compactly for sharing
     
-    In a real implementation, this would encode the track data in the URL or
-    upload it to a server and return a short URL.
+    Each piece is a flag byte (type, rotation, whether it has a length or
+    sits off the grid) followed by its position as a zigzag varint delta,
+    in grid cells, from the previous piece. The result is deflated and
+    url-safe base64 encoded without padding.
     """
-    # Simple implementation - encode track data in base64
-    track_json = json.dumps(track.to_dict())
-    encoded = base64.urlsafe_b64encode(track_json.encode()).decode()
+    lane_width = track.lane_width
+    out = bytearray(struct.pack("<ddd", track.width, track.depth, lane_width))
+    _write_varint(out, len(track.store))
+    
+    store = track.store
+    prev_x = prev_y = 0
+    for slot in range(len(store)):
+        type_code = store.types[slot]
+        x = store.xs[slot]
+        y = store.ys[slot]
+        rotation = store.rotations[slot]
+        length = store.lengths[slot]
+        
+        flags = type_code
+        if rotation in _SHARE_ROTATIONS:
+            flags |= _SHARE_ROTATIONS.index(rotation) << 3
+        else:
+            flags |= _SHARE_CUSTOM_ROTATION << 3
+        if length != 1:
+            flags |= _SHARE_HAS_LENGTH
+        
+        grid_x = x / lane_width
+        grid_y = y / lane_width
+        on_grid = grid_x.is_integer() and grid_y.is_integer()
+        if not on_grid:
+            flags |= _SHARE_OFF_GRID
+        
+        out.append(flags)
+        if on_grid:
+            _write_varint(out, _zigzag(int(grid_x) - prev_x))
+            _write_varint(out, _zigzag(int(grid_y) - prev_y))
+            prev_x, prev_y = int(grid_x), int(grid_y)
+        else:
+            out += struct.pack("<dd", x, y)
+        if flags >> 3 & 0x7 == _SHARE_CUSTOM_ROTATION:
+            _write_varint(out, _zigzag(rotation))
+        if flags & _SHARE_HAS_LENGTH:
+            _write_varint(out, length)
+    
+    encoded = base64.urlsafe_b64encode(zlib.compress(bytes(out), 9)).decode()
+    return SHARE_TOKEN_TAG + encoded.rstrip("=")
+
+def decode_track(token):
+    """Reconstruct a Track from a token made by encode_track"""
+    from models import Track, Piece, PIECE_TYPES, check_track_dimensions  # Import here to avoid circular imports
+    
+    if not token.startswith(SHARE_TOKEN_TAG):
+        raise ValueError("Unknown sharing format")
+    
+    token = token[len(SHARE_TOKEN_TAG):]
+    try:
+        decompressor = zlib.decompressobj()
+        data = decompressor.decompress(
+            base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)), SHARE_MAX_BYTES)
+    except (ValueError, zlib.error) as e:
+        raise ValueError(f"Invalid sharing data: {e}")
+    if decompressor.unconsumed_tail or (not decompressor.eof and len(data) >= SHARE_MAX_BYTES):
+        raise ValueError(f"Sharing data is too large (max {SHARE_MAX_BYTES} bytes)")
+    if not decompressor.eof:
+        raise ValueError("Sharing data is truncated")
+    
+    if len(data) < 24:
+        raise ValueError("Sharing data is truncated")
+    width, depth, lane_width = struct.unpack_from("<ddd", data)
+    count, pos = _read_varint(data, 24)
     
+    check_track_dimensions(width, depth, lane_width)
+    track = Track(width=width, depth=depth, lane_width=lane_width)
+    prev_x = prev_y = 0
+    for _ in range(count):
+        if pos >= len(data):
+            raise ValueError("Sharing data is truncated")
+        flags = data[pos]
+        pos += 1
+        
+        type_code = flags & 0x7
+        if type_code >= len(PIECE_TYPES):
+            raise ValueError("Sharing data contains an unknown piece type")
+        
+        if flags & _SHARE_OFF_GRID:
+            if pos + 16 > len(data):
+                raise ValueError("Sharing data is truncated")
+            x, y = struct.unpack_from("<dd", data, pos)
+            pos += 16
+        else:
+            delta, pos = _read_varint(data, pos)
+            prev_x += _unzigzag(delta)
+            delta, pos = _read_varint(data, pos)
+            prev_y += _unzigzag(delta)
+            x = prev_x * lane_width
+            y = prev_y * lane_width
+        
+        rotation_index = flags >> 3 & 0x7
+        if rotation_index == _SHARE_CUSTOM_ROTATION:
+            rotation, pos = _read_varint(data, pos)
+            rotation = _unzigzag(rotation)
+        elif rotation_index < len(_SHARE_ROTATIONS):
+            rotation = _SHARE_ROTATIONS[rotation_index]
+        else:
+            raise ValueError("Sharing data contains an invalid rotation")
+        
+        length = 1
+        if flags & _SHARE_HAS_LENGTH:
+            length, pos = _read_varint(data, pos)
+        
+        track.add_piece(Piece(PIECE_TYPES[type_code], x, y, rotation, length))
+    
+    return track
+
+def generate_sharing_url(track):
+    """Generate a URL for sharing the track, with the track encoded in it"""
     # In a real app, this would be a domain you control
-    return f"https://guttertrack.example.com/share/{encoded}"
+    return SHARE_URL_BASE + encode_track(track)
+
+def decode_sharing_url(url):
+    """
+    Reconstruct the track from a sharing URL (or just its token)
+    
+    Links made before the compact format, which carry base64 JSON, are
+    still accepted.
+    """
+    from models import Track  # Import here to avoid circular imports
+    
+    token = url.rsplit("/", 1)[-1].strip()
+    if token.startswith(SHARE_TOKEN_TAG):
+        return decode_track(token)
+    
+    try:
+        track_json = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return Track.from_dict(json.loads(track_json))
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid sharing URL: {e}")
 
 def get_optimal_cell_size(grid_width, grid_height, container_width, container_height):
     """Calculate the optimal cell size based on grid dimensions and container size"""
@@ -146,6 +524,20 @@ def get_optimal_cell_size(grid_width, grid_height, container_width, container_he
     # Ensure a reasonable size (between 20 and 60 pixels)
     return max(20, min(60, cell_size))
 
+# Default prices in USD
+DEFAULT_PRICES = {
+    "straight_foot": 3.50,  # Price per foot of straight gutter
+    "elbow_22_5": 3.99,    # Price per 22.5° elbow
+    "elbow_45": 4.49,      # Price per 45° elbow
+    "elbow_90": 4.99,      # Price per 90° elbow
+    "t_junction": 7.99,    # Price per T-junction
+    "connector": 1.99,     # Price per connector
+    "screw": 0.10          # Price per screw
+}
+
+# Bump whenever DEFAULT_PRICES change so memoized costs are recomputed
+PRICE_TABLE_VERSION = 1
+
 def calculate_materials_cost(bom, prices=None):
     """
     Calculate the cost of materials based on the bill of materials
@@ -157,23 +549,12 @@ def calculate_materials_cost(bom, prices=None):
     Returns:
         Dictionary with cost breakdown and total
     """
-    # Default prices in USD
-    default_prices = {
-        "straight_foot": 3.50,  # Price per foot of straight gutter
-        "elbow_22_5": 3.99,    # Price per 22.5° elbow
-        "elbow_45": 4.49,      # Price per 45° elbow
-        "elbow_90": 4.99,      # Price per 90° elbow
-        "t_junction": 7.99,    # Price per T-junction
-        "connector": 1.99,     # Price per connector
-        "screw": 0.10          # Price per screw
-    }
-    
     # Use provided prices or defaults
     if prices is None:
-        prices = default_prices
+        prices = DEFAULT_PRICES
     else:
         # Merge with defaults for any missing prices
-        for key, value in default_prices.items():
+        for key, value in DEFAULT_PRICES.items():
             if key not in prices:
                 prices[key] = value
     
@@ -211,21 +592,3 @@ def calculate_materials_cost(bom, prices=None):
 def format_currency(amount):
     """Format an amount as USD currency"""
     return f"${amount:.2f}"
-
-def create_error_snackbar(page, message):
-    """Create and show an error snackbar"""
-    page.snack_bar = ft.SnackBar(
-        content=ft.Text(message),
-        bgcolor=ft.colors.RED
-    )
-    page.snack_bar.open = True
-    page.update()
-
-def create_success_snackbar(page, message):
-    """Create and show a success snackbar"""
-    page.snack_bar = ft.SnackBar(
-        content=ft.Text(message),
-        bgcolor=ft.colors.GREEN
-    )
-    page.snack_bar.open = True
-    page.update()
\ No newline at end of file
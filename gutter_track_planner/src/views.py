@@ -1,5 +1,6 @@
 import flet as ft
 import asyncio
+from utils import validate_dimensions
 
 class SetupDialog(ft.AlertDialog):
     def __init__(self, on_confirmed):
@@ -53,8 +54,9 @@ class SetupDialog(ft.AlertDialog):
             depth = float(self.depth_field.value)
             lane_width = float(self.lane_width_field.value)
             
-            if width <= 0 or depth <= 0 or lane_width <= 0:
-                raise ValueError("Dimensions must be positive numbers")
+            errors = validate_dimensions(width, depth, lane_width)
+            if errors:
+                raise ValueError(errors[0])
             
             # Store callback and data
             callback = self.on_confirmed_callback
@@ -86,12 +88,15 @@ class GridCell(ft.Container):
         self.border_radius = 3
         self.data = {"row": row, "col": col}
         
+        # What the cell currently shows, used to skip repaints that change nothing
+        self.visual_state = None
+        
         # Setup for drag target
         self.on_drag_target_callback = on_drag_target
         
         # When a cell is tapped (for selection/modification)
-        if on_tap:
-            self.on_click = lambda e: on_tap(row, col)
+        self.default_on_click = (lambda e: on_tap(self.row, self.col)) if on_tap else None
+        self.on_click = self.default_on_click
     
     def _get_control_name(self):
         return f"grid-cell-{self.row}-{self.col}"
@@ -99,9 +104,25 @@ class GridCell(ft.Container):
     def set_content(self, content):
         self.content = content
         self.update()
+    
+    def move_to(self, row, col):
+        """Recycle the cell to show a different grid position"""
+        self.row = row
+        self.col = col
+        self.data = {"row": row, "col": col}
+    
+    def clear(self):
+        """Return the cell to its empty state"""
+        self.content = None
+        self.bgcolor = None
+        self.on_click = self.default_on_click
 
 class TrackGrid(ft.Column):
-    def __init__(self, track, on_cell_tap=None, on_piece_selected=None):
+    VIEWPORT_SIZE = 600  # Pixels available to the grid
+    MIN_CELL_SIZE = 20  # Smallest cell that is still comfortable to tap
+    VIEWPORT_MARGIN = 2  # Cells materialized past the visible edge
+    
+    def __init__(self, track, on_cell_tap=None, on_piece_selected=None, viewport_size=None):
         super().__init__()
         self.track = track
         self.on_cell_tap_callback = on_cell_tap
@@ -109,18 +130,38 @@ class TrackGrid(ft.Column):
         self.tight = True
         self.alignment = ft.MainAxisAlignment.CENTER
         
-        self.cell_size = min(40, 600 // max(track.grid_width, track.grid_height))  # Adaptive cell size
+        viewport_size = viewport_size or self.VIEWPORT_SIZE
+        self.cell_size = max(
+            self.MIN_CELL_SIZE,
+            min(40, viewport_size // max(track.grid_width, track.grid_height))  # Adaptive cell size
+        )
+        
+        # Only the cells inside the viewport exist; they are recycled as the user pans
+        visible_cells = viewport_size // self.cell_size + self.VIEWPORT_MARGIN
+        self.viewport_cols = min(track.grid_width, visible_cells)
+        self.viewport_rows = min(track.grid_height, visible_cells)
+        self.origin_row = 0
+        self.origin_col = 0
+        self._pan_x = 0
+        self._pan_y = 0
         
         # Create grid rows
         self.rows = []
-        for row in range(track.grid_height):
+        for row in range(self.viewport_rows):
             row_container = ft.Row(
-                [self._create_cell(row, col) for col in range(track.grid_width)],
+                [self._create_cell(row, col) for col in range(self.viewport_cols)],
                 tight=True,
             )
             self.rows.append(row_container)
         
-        self.controls = self.rows
+        self.controls = [
+            ft.GestureDetector(
+                content=ft.Column(self.rows, tight=True),
+                on_pan_update=self._on_pan_update
+            )
+        ]
+        
+        self.painted = False
     
     def _get_control_name(self):
         return "track-grid"
@@ -136,61 +177,121 @@ class TrackGrid(ft.Column):
     
     def update_view(self):
         """Update the grid view to reflect the current state of the track"""
-        # Clear all cells
+        if not self.painted:
+            # First frame: paint the whole viewport
+            self.track.take_dirty_cells()
+            changed = self._paint_viewport()
+            self.painted = True
+        else:
+            # Only cells touched by edits since the last frame can have changed
+            dirty_cells = self.track.take_dirty_cells()
+            if dirty_cells is None:
+                changed = self._paint_viewport()
+            else:
+                changed = []
+                for grid_x, grid_y in dirty_cells:
+                    cell = self._cell_at(grid_x, grid_y)
+                    if cell is not None and self._paint_cell(cell):
+                        changed.append(cell)
+        
+        self._send(changed)
+    
+    def scroll_to(self, row, col):
+        """Move the viewport so its top-left cell shows the given grid position"""
+        row = max(0, min(row, self.track.grid_height - self.viewport_rows))
+        col = max(0, min(col, self.track.grid_width - self.viewport_cols))
+        if (row, col) == (self.origin_row, self.origin_col):
+            return
+        
+        self.origin_row = row
+        self.origin_col = col
+        for r, row_container in enumerate(self.rows):
+            for c, cell in enumerate(row_container.controls):
+                cell.move_to(row + r, col + c)
+        
+        self._send(self._paint_viewport())
+    
+    def _on_pan_update(self, e):
+        # Accumulate drag distance and shift the viewport a whole cell at a time
+        self._pan_x += e.delta_x
+        self._pan_y += e.delta_y
+        cols = int(self._pan_x / self.cell_size)
+        rows = int(self._pan_y / self.cell_size)
+        if cols or rows:
+            self._pan_x -= cols * self.cell_size
+            self._pan_y -= rows * self.cell_size
+            self.scroll_to(self.origin_row - rows, self.origin_col - cols)
+    
+    def _cell_at(self, grid_x, grid_y):
+        """Return the cell control showing a grid position, if it is in the viewport"""
+        row = grid_y - self.origin_row
+        col = grid_x - self.origin_col
+        if 0 <= row < self.viewport_rows and 0 <= col < self.viewport_cols:
+            return self.rows[row].controls[col]
+        return None
+    
+    def _paint_viewport(self):
+        changed = []
         for row_container in self.rows:
-            for cell in row_container.controls:
-                cell.content = None
-                cell.bgcolor = None
-        
-        # Add pieces to the grid
-        for piece in self.track.pieces:
-            self._render_piece(piece)
-        
-        self.update()
+            controls = row_container.controls
+            if not controls:
+                continue
+            
+            # Read the row's type plane once; free cells that are already
+            # blank need no piece lookup at all
+            start = controls[0].col
+            types = self.track.occupancy.row(controls[0].row, start, start + len(controls))
+            for cell in controls:
+                if types[cell.col - start] == 0 and cell.visual_state is None:
+                    continue
+                if self._paint_cell(cell):
+                    changed.append(cell)
+        return changed
+    
+    def _paint_cell(self, cell):
+        """Bring a cell in line with the track, returning True if it changed"""
+        piece = self.track.piece_at_position(cell.col, cell.row)
+        state = None if piece is None else (piece.id, piece.type, piece.rotation, piece.length)
+        if cell.visual_state == state:
+            return False
+        
+        cell.visual_state = state
+        if piece is None:
+            cell.clear()
+        else:
+            self._render_cell(cell, piece)
+        return True
     
-    def _render_piece(self, piece):
+    def _send(self, changed):
+        # Send just the changed cells to the client in one batch
+        if changed and self.page:
+            self.page.update(*changed)
+    
+    def _render_cell(self, cell, piece):
         from models import PieceType  # Import here to avoid circular imports
         
-        grid_cells = piece.get_occupied_cells(self.track.lane_width)
-        
-        for grid_x, grid_y in grid_cells:
-            if 0 <= grid_y < len(self.rows) and 0 <= grid_x < len(self.rows[0].controls):
-                cell = self.rows[grid_y].controls[grid_x]
-                
-                # Style based on piece type
-                if piece.type == PieceType.STRAIGHT:
-                    cell.bgcolor = ft.colors.BLUE_200
-                elif piece.type == PieceType.ELBOW_22_5:
-                    cell.bgcolor = ft.colors.GREEN_100
-                elif piece.type == PieceType.ELBOW_45:
-                    cell.bgcolor = ft.colors.GREEN_200
-                elif piece.type == PieceType.ELBOW_90:
-                    cell.bgcolor = ft.colors.GREEN_400
-                elif piece.type == PieceType.T_JUNCTION:
-                    cell.bgcolor = ft.colors.ORANGE_400
-                
-                # Add rotation indicator
-                rotation_text = str(piece.rotation) + "°"
-                
-                # Add piece label
-                if piece.type == PieceType.STRAIGHT:
-                    label = f"S {piece.length}"
-                elif piece.type == PieceType.ELBOW_22_5:
-                    label = "E22"
-                elif piece.type == PieceType.ELBOW_45:
-                    label = "E45"
-                elif piece.type == PieceType.ELBOW_90:
-                    label = "E90"
-                elif piece.type == PieceType.T_JUNCTION:
-                    label = "T"
-                
-                cell.content = ft.Column([
-                    ft.Text(label, size=10, color=ft.colors.BLACK, weight=ft.FontWeight.BOLD),
-                    ft.Text(rotation_text, size=8, color=ft.colors.BLACK54)
-                ], alignment=ft.MainAxisAlignment.CENTER, spacing=0)
-                
-                # Make the cell clickable to select the piece
-                cell.on_click = lambda e, p=piece: self._on_piece_clicked(p)
+        # Style based on piece type
+        if piece.type == PieceType.STRAIGHT:
+            cell.bgcolor = ft.colors.BLUE_200
+        elif piece.type == PieceType.ELBOW_22_5:
+            cell.bgcolor = ft.colors.GREEN_100
+        elif piece.type == PieceType.ELBOW_45:
+            cell.bgcolor = ft.colors.GREEN_200
+        elif piece.type == PieceType.ELBOW_90:
+            cell.bgcolor = ft.colors.GREEN_400
+        elif piece.type == PieceType.T_JUNCTION:
+            cell.bgcolor = ft.colors.ORANGE_400
+        
+        # Add rotation indicator
+        rotation_text = str(piece.rotation) + "°"
+        
+        cell.content = ft.Column([
+            ft.Text(piece.label, size=10, color=ft.colors.BLACK, weight=ft.FontWeight.BOLD),
+            ft.Text(rotation_text, size=8, color=ft.colors.BLACK54)
+        ], alignment=ft.MainAxisAlignment.CENTER, spacing=0)
+        
+        # Make the cell clickable to select the piece
+        cell.on_click = lambda e, p=piece: self._on_piece_clicked(p)
     
     def _on_piece_clicked(self, piece):
         if self.on_piece_selected_callback:
@@ -313,6 +414,8 @@ class PiecePropertiesPanel(ft.Container):
         
         self.selected_piece = None
         
+        from models import MAX_STRAIGHT_LENGTH  # Import here to avoid circular imports
+        
         # Rotation control
         self.rotation_slider = ft.Slider(
             min=0,
@@ -328,8 +431,8 @@ class PiecePropertiesPanel(ft.Container):
         # Length control (for straight pieces)
         self.length_slider = ft.Slider(
             min=1,
-            max=5,
-            divisions=4,
+            max=MAX_STRAIGHT_LENGTH,
+            divisions=MAX_STRAIGHT_LENGTH - 1,
             label="{value}",
             value=1,
             on_change=self._on_length_changed
@@ -447,4 +550,22 @@ class BOMView(ft.Container):
         self.t_junction_text.value = f"T-Junctions: {bom_data['t_junctions']}"
         self.connectors_text.value = f"Connectors: {bom_data['connectors']}"
         self.screws_text.value = f"Screws: {bom_data['screws']}"
-        self.update()
\ No newline at end of file
+        self.update()
+
+def create_error_snackbar(page, message):
+    """Create and show an error snackbar"""
+    page.snack_bar = ft.SnackBar(
+        content=ft.Text(message),
+        bgcolor=ft.colors.RED
+    )
+    page.snack_bar.open = True
+    page.update()
+
+def create_success_snackbar(page, message):
+    """Create and show a success snackbar"""
+    page.snack_bar = ft.SnackBar(
+        content=ft.Text(message),
+        bgcolor=ft.colors.GREEN
+    )
+    page.snack_bar.open = True
+    page.update()
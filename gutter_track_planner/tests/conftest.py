@@ -0,0 +1,12 @@
+import pytest
+import random_tracks
+
+@pytest.fixture
+def random_piece():
+    """random_tracks.random_piece(rng, track, ...): an unplaced random piece on a track's board"""
+    return random_tracks.random_piece
+
+@pytest.fixture
+def random_track():
+    """random_tracks.random_track(rng, pieces, ...): a board filled with random pieces"""
+    return random_tracks.random_track
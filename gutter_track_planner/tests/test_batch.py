@@ -0,0 +1,28 @@
+import json
+import random
+import pytest
+from api import BomCalculator
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_batch_prices_dicts_json_and_gtrk_files_alike(tmp_path, max_workers, random_track):
+    items = []
+    expected = []
+    for seed in range(6):
+        track = random_track(random.Random(seed), 150, width=8, depth=8, attempts=1)
+        expected.append(BomCalculator.calculate_bom(track.to_dict()))
+        if seed % 3 == 0:
+            items.append(track.to_dict())
+        elif seed % 3 == 1:
+            path = tmp_path / f"track{seed}.json"
+            path.write_text(json.dumps(track.to_dict()))
+            items.append(str(path))
+        else:
+            path = tmp_path / f"track{seed}.gtrk"
+            path.write_bytes(track.to_bytes())
+            items.append(path)
+    
+    items.append(str(tmp_path / "missing.gtrk"))
+    results = list(BomCalculator.calculate_bom_batch(items, max_workers=max_workers, chunksize=2))
+    
+    assert results[:-1] == expected
+    assert results[-1]["status"] == "error"
@@ -0,0 +1,102 @@
+import random
+import pytest
+import models
+from api import BomCalculator
+from models import Track, Piece, PieceType, PIECE_TYPES, BillOfMaterials, MAX_STRAIGHT_LENGTH, footprint
+from utils import calculate_materials_cost
+
+def random_edit(rng, track, placed, random_piece):
+    action = rng.random()
+    if not placed or action < 0.4:
+        piece = random_piece(rng, track)
+        if track.add_piece(piece):
+            placed.append(piece)
+    elif action < 0.55:
+        track.remove_piece(placed.pop(rng.randrange(len(placed))))
+    elif action < 0.7:
+        rng.choice(placed).rotate(rng.choice([90, 180, 270]))
+    elif action < 0.85:
+        piece = rng.choice(placed)
+        track.update_piece(
+            piece,
+            x=rng.randrange(track.grid_width) * track.lane_width,
+            length=rng.randint(1, 4)
+        )
+    else:
+        piece = rng.choice(placed)
+        try:
+            piece.type = rng.choice(PIECE_TYPES)
+        except ValueError:
+            pass  # The new footprint doesn't fit, so nothing changed
+
+@pytest.mark.parametrize("seed", range(4))
+def test_running_tally_matches_a_full_recount(seed, random_piece):
+    rng = random.Random(seed)
+    track = Track(width=rng.randint(2, 6), depth=rng.randint(2, 6), lane_width=rng.choice([2, 3, 4.5, 6, 7]))
+    bom = BillOfMaterials(track)
+    placed = []
+    
+    for _ in range(1500):
+        random_edit(rng, track, placed, random_piece)
+        assert bom.calculate() == bom.recount()
+    
+    # A reloaded copy counts from scratch
+    assert BillOfMaterials(Track.from_dict(track.to_dict())).calculate() == bom.recount()
+
+@pytest.mark.parametrize("seed", range(4))
+def test_optimized_track_keeps_its_footprint_and_never_costs_more(seed, random_piece):
+    rng = random.Random(seed)
+    track = Track(width=6, depth=6, lane_width=6)
+    placed = []
+    for _ in range(400):
+        random_edit(rng, track, placed, random_piece)
+    
+    result = BomCalculator.optimize_track(track.to_dict())
+    assert result["status"] == "success"
+    
+    optimized = Track.from_dict(result["track"])
+    assert sorted(optimized.occupied_cells()) == sorted(track.occupied_cells())
+    assert optimized.connections.component_count() == track.connections.component_count()
+    
+    # The reported figures match a full recount of the track it returned
+    assert result["bom"] == BillOfMaterials(optimized).recount()
+    before = calculate_materials_cost(BillOfMaterials(track).recount())
+    assert result["cost"]["total"] <= before["total"]
+
+def test_merged_straights_stay_within_the_longest_sold():
+    track = Track(width=50, depth=2, lane_width=6)
+    for index in range(25):
+        track.add_piece(Piece(PieceType.STRAIGHT, x=index * 12, y=0, length=2))
+    
+    result = BomCalculator.optimize_track(track.to_dict())
+    lengths = [piece["length"] for piece in result["track"]["pieces"]]
+    assert sum(lengths) == 50
+    assert sorted(lengths) == [MAX_STRAIGHT_LENGTH] * 10
+    assert result["bom"]["connectors"] == len(lengths) - 1
+    
+    # A run that doesn't divide evenly leaves one short piece
+    uneven = BomCalculator.optimize_track(track.to_dict(), max_length=4)
+    assert sorted(piece["length"] for piece in uneven["track"]["pieces"]) == [2] + [4] * 12
+    
+    uncapped = BomCalculator.optimize_track(track.to_dict(), max_length=None)
+    assert [piece["length"] for piece in uncapped["track"]["pieces"]] == [50]
+
+def test_straights_longer_than_the_board_are_dropped_without_building_their_cells(monkeypatch):
+    track = Track(width=10, depth=10, lane_width=6)
+    track.add_piece(Piece(PieceType.STRAIGHT, x=0, y=0, length=2))
+    data = track.to_dict()
+    data["pieces"] += [
+        {"type": PieceType.STRAIGHT.value, "x": 0, "y": 6, "rotation": 0, "length": 3_000_000},
+        {"type": PieceType.STRAIGHT.value, "x": 0, "y": 12, "rotation": 90, "length": 3_000_001}
+    ]
+    lengths = []
+    
+    def recording_footprint(piece_type, rotation, length):
+        lengths.append(length)
+        return footprint(piece_type, rotation, length)
+    
+    monkeypatch.setattr(models, "footprint", recording_footprint)
+    result = BomCalculator.calculate_bom(data)
+    assert result["status"] == "success"
+    assert result["bom"]["straight_feet"] == 1.0
+    assert lengths and max(lengths) <= track.grid_width
@@ -0,0 +1,21 @@
+import io
+import json
+import random
+from cli import main
+
+def test_cli_reads_json_gtrk_and_stdin_alike(tmp_path, random_track):
+    track = random_track(random.Random(3), 150, width=8, depth=8, attempts=1)
+    (tmp_path / "a.json").write_text(json.dumps(track.to_dict()))
+    (tmp_path / "b.gtrk").write_bytes(track.to_bytes())
+    (tmp_path / ".index").mkdir()
+    (tmp_path / ".index" / "manifest.json").write_text("{}")
+    
+    out = io.StringIO()
+    stdin = io.StringIO(json.dumps(track.to_dict()) + "\n")
+    assert main([str(tmp_path), "-", "-j", "1"], stdin=stdin, stdout=out) == 0
+    
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [result["source"] for result in results] == [
+        str(tmp_path / "a.json"), str(tmp_path / "b.gtrk"), "<stdin>:1"
+    ]
+    assert len({json.dumps(result["bom"]) for result in results}) == 1
@@ -0,0 +1,37 @@
+from collections import OrderedDict
+from xml.etree import ElementTree
+import random
+import utils
+
+def test_tile_cache_stays_within_its_byte_budget(monkeypatch, random_track):
+    track = random_track(random.Random(5), 400, width=20, depth=20, lane_width=3, attempts=1, max_length=1)
+    
+    monkeypatch.setattr(utils, "_tile_cache", OrderedDict())
+    monkeypatch.setattr(utils, "_tile_cache_bytes", 0)
+    expected = utils.export_track_as_image(track, cell_size=5, tile_cells=8)
+    
+    monkeypatch.setattr(utils, "_tile_cache", OrderedDict())
+    monkeypatch.setattr(utils, "_tile_cache_bytes", 0)
+    monkeypatch.setattr(utils, "TILE_CACHE_BYTES", 20000)
+    for _ in range(2):
+        assert utils.export_track_as_image(track, cell_size=5, tile_cells=8) == expected
+        assert 0 < utils._tile_cache_bytes <= 20000
+        assert utils._tile_cache_bytes == sum(size for _, size in utils._tile_cache.values())
+
+def test_svg_export_is_well_formed_with_one_group_per_piece(tmp_path, random_track):
+    track = random_track(random.Random(2), 60, width=10, depth=5, lane_width=6)
+    path = tmp_path / "track.svg"
+    utils.export_track_as_svg(track, str(path), cell_size=10, title='Tom & Jerry\'s <"loop">')
+    
+    namespace = {"svg": "http://www.w3.org/2000/svg"}
+    root = ElementTree.parse(path).getroot()
+    assert root.get("viewBox") == f"0 0 {track.grid_width * 10} {track.grid_height * 10}"
+    assert root.find("svg:title", namespace).text == 'Tom & Jerry\'s <"loop">'
+    
+    groups = root.findall("svg:g/svg:g", namespace)
+    assert groups
+    assert sorted(int(group.get("id").split("-")[1]) for group in groups) == sorted(track.store)
+    for group in groups:
+        piece_id = int(group.get("id").split("-")[1])
+        assert len(group.findall("svg:rect", namespace)) == len(track._piece_cells(piece_id))
+        assert len(group.findall("svg:text", namespace)) == 2
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+CORE_MODULES = ("models", "api", "utils", "persistence")
+
+# Slow imports the core modules only pull in when a feature needs them
+DEFERRED_MODULES = (
+    "flet", "numpy", "PIL", "asyncio", "concurrent.futures", "multiprocessing",
+    "tempfile", "subprocess", "inspect", "xml"
+)
+
+def test_core_modules_leave_slow_imports_until_they_are_needed():
+    # A fresh interpreter, so modules other tests imported don't count
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {', '.join(CORE_MODULES)}; print(' '.join(sys.modules))"],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    loaded = set(result.stdout.split())
+    assert set(CORE_MODULES) <= loaded
+    assert sorted(loaded.intersection(DEFERRED_MODULES)) == []
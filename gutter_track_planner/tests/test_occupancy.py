@@ -0,0 +1,77 @@
+import struct
+import pytest
+from models import Track, Piece, PieceType
+from utils import encode_track, decode_track
+
+def test_planes_are_only_allocated_once_a_piece_is_placed():
+    track = Track(width=100, depth=100, lane_width=2)
+    assert track.occupancy.types is None
+    assert track.free_cell_count() == 600 * 600
+    assert track.occupied_cells() == []
+    assert track.piece_at_position(5, 5) is None
+    
+    track.add_piece(Piece(PieceType.STRAIGHT, x=0, y=0, length=3))
+    assert len(track.occupancy.types) == 600 * 600
+    assert track.free_cell_count() == 600 * 600 - 3
+
+def test_free_region_stops_at_walls():
+    track = Track(width=3, depth=3, lane_width=6)  # 6 x 6 cells
+    for y in range(6):
+        track.add_piece(Piece(PieceType.STRAIGHT, x=12, y=y * 6))
+    
+    left = track.free_region(0, 0)
+    assert len(left) == 12
+    assert all(x < 2 for x, _ in left)
+    assert track.free_region(2, 0) == []
+
+def test_can_place_pieces_matches_adding_in_order():
+    track = Track(width=4, depth=4, lane_width=6)
+    track.add_piece(Piece(PieceType.STRAIGHT, x=0, y=0, length=2))
+    batch = [
+        Piece(PieceType.STRAIGHT, x=6, y=0),              # Overlaps the placed piece
+        Piece(PieceType.STRAIGHT, x=0, y=6, length=3),
+        Piece(PieceType.ELBOW_90, x=12, y=6),              # Overlaps the previous one
+        Piece(PieceType.STRAIGHT, x=48, y=0)               # Off the grid
+    ]
+    expected = [False, True, False, False]
+    assert track.can_place_pieces(batch) == expected
+    assert [track.add_piece(piece) for piece in batch] == expected
+
+@pytest.mark.parametrize("width, depth, lane_width", [(2000, 10, 6), (10, 10, 0.01)])
+def test_deserializers_reject_oversized_boards(width, depth, lane_width):
+    with pytest.raises(ValueError):
+        Track.from_dict({"width": width, "depth": depth, "lane_width": lane_width, "pieces": []})
+    
+    data = bytearray(Track(width=8, depth=4, lane_width=6).to_bytes())
+    struct.pack_into("<ddd", data, 8, width, depth, lane_width)
+    with pytest.raises(ValueError):
+        Track.from_bytes(bytes(data))
+    
+    with pytest.raises(ValueError):
+        decode_track(encode_track(Track(width=width, depth=depth, lane_width=lane_width)))
+
+def test_pinch_points_between_diagonal_walls():
+    # Two staircase walls along y = x and y = x - 2 are 2 * 6 / sqrt(2)
+    # inches apart, leaving a lane of about 6.5 inches
+    track = Track(width=10, depth=10, lane_width=6)
+    for i in range(20):
+        track.add_piece(Piece(PieceType.ELBOW_22_5, x=i * 6, y=i * 6))
+        if i >= 2:
+            track.add_piece(Piece(PieceType.ELBOW_22_5, x=i * 6, y=(i - 2) * 6))
+    
+    across = [p for p in track.find_pinch_points(8) if p["axis"] == "anti-diagonal"]
+    assert len(across) == 18
+    assert all(p["width"] == pytest.approx(6.49, abs=0.01) for p in across)
+    assert track.find_pinch_points(6) == []
+
+def test_pinch_points_between_corner_touching_straights():
+    track = Track(width=10, depth=10, lane_width=6)
+    track.add_piece(Piece(PieceType.STRAIGHT, x=0, y=0, length=3))
+    track.add_piece(Piece(PieceType.STRAIGHT, x=18, y=6, length=3))
+    
+    pinches = track.find_pinch_points(10)
+    assert [(p["axis"], p["start"], p["end"]) for p in pinches] == [("diagonal", (2, 0), (3, 1))]
+    
+    # Filling the corner turns it into a continuous wall measured along its row
+    track.add_piece(Piece(PieceType.STRAIGHT, x=18, y=0))
+    assert all(p["axis"] != "diagonal" for p in track.find_pinch_points(10))
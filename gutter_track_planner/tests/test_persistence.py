@@ -0,0 +1,178 @@
+import json
+import os
+from types import SimpleNamespace
+import persistence
+from models import Track, Piece, PieceType
+from persistence import AutosaveService, LocalStorageCache, MemoryStorage, TrackStorage
+
+def test_autosave_restores_the_scheduled_snapshot(tmp_path):
+    storage = SimpleNamespace(storage_type="local", data_dir=str(tmp_path))
+    autosave = AutosaveService(storage, delay=60)
+    track = Track(width=4, depth=4, lane_width=6)
+    track.add_piece(Piece(PieceType.ELBOW_90, x=6, y=6, rotation=90))
+    
+    autosave.schedule(track)
+    track.add_piece(Piece(PieceType.STRAIGHT, x=0, y=0))  # After the snapshot
+    autosave.stop()
+    
+    assert autosave.last_error is None
+    success, restored = autosave.restore()
+    assert success
+    assert [(p.type, p.x, p.y, p.rotation) for p in restored.pieces] == [
+        (PieceType.ELBOW_90, 6, 6, 90)
+    ]
+
+def make_track(pieces):
+    track = Track(width=4, depth=4, lane_width=6)
+    for x in range(pieces):
+        track.add_piece(Piece(PieceType.STRAIGHT, x=x * 6, y=0))
+    return track
+
+def test_track_edited_in_place_is_noticed_on_load_or_refresh(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    storage = TrackStorage("TestApp")
+    storage.save_track(make_track(1), "a.json")
+    storage.save_track(make_track(2), "b.json")
+    assert [track["pieces"] for track in storage.list_tracks()] == [2, 1]
+    
+    # Rewriting a file in place leaves the directory mtime alone
+    for name in ("a.json", "b.json"):
+        path = os.path.join(storage.data_dir, name)
+        with open(path, "w") as f:
+            f.write(json.dumps(make_track(3).to_dict()))
+        os.utime(path, ns=(1, 10 ** 18))
+    
+    # Listing only stats the directory, not every track
+    stats = []
+    stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda path, *args, **kwargs: stats.append(path) or stat(path, *args, **kwargs))
+    storage.list_tracks()
+    assert stats == [storage.data_dir]
+    monkeypatch.setattr(os, "stat", stat)
+    
+    assert storage.load_track("a.json")[0]
+    assert {track["name"]: track["pieces"] for track in storage.list_tracks()} == {"a.json": 3, "b.json": 2}
+    assert {track["name"]: track["pieces"] for track in storage.list_tracks(refresh=True)} == {"a.json": 3, "b.json": 3}
+
+def test_web_listing_ignores_other_local_storage_users(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    backend = MemoryStorage()
+    monkeypatch.setattr(persistence, "localStorage", backend, raising=False)
+    storage = TrackStorage("TestApp")
+    storage.storage_type = "web"
+    storage.save_track(make_track(1), "a.json")
+    manifest = storage._load_manifest()
+    
+    LocalStorageCache(backend=backend).set("tile", "cached")
+    assert not storage._manifest_drifted(manifest)
+    
+    # A track written behind the manifest's back is picked up
+    backend.setItem("TestApp_track_a.json", json.dumps(make_track(2).to_dict()))
+    storage._bump_version()
+    assert storage.list_tracks()[0]["pieces"] == 2
+
+def test_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(persistence.time, "time", lambda: now[0])
+    cache = LocalStorageCache(backend=MemoryStorage())
+    cache.set("short", "value", expiry_seconds=10)
+    cache.set("forever", {"value": 1})
+    
+    assert cache.get("short") == "value"
+    now[0] += 10
+    assert cache.get("short") is None
+    assert cache.get("forever") == {"value": 1}
+    assert cache.purge_expired() == 0
+
+def test_cache_evicts_the_least_recently_used_across_reloads():
+    backend = MemoryStorage()
+    cache = LocalStorageCache(backend=backend, max_bytes=500)  # Room for two entries
+    cache.set("a", "x" * 100)
+    cache.set("b", "x" * 100)
+    assert cache.get("a")
+    
+    # Reading "a" made "b" the oldest, even for a cache opened afterwards
+    reloaded = LocalStorageCache(backend=backend, max_bytes=500)
+    assert reloaded.set("c", "x" * 100)
+    assert reloaded.get("b") is None
+    assert reloaded.get("a") and reloaded.get("c")
+
+def test_cache_evicts_when_storage_is_full():
+    cache = LocalStorageCache(backend=MemoryStorage(quota_bytes=1000))
+    for key in "abcd":
+        assert cache.set(key, "x" * 100)
+    
+    assert cache.get("a") is None
+    assert cache.get("d")
+    assert list(LocalStorageCache(backend=cache.backend)._index) == list(cache._index)
+
+def test_cache_keeps_its_entries_when_a_write_fails_for_another_reason():
+    class FailingStorage(MemoryStorage):
+        def setItem(self, key, value):
+            if key.endswith("broken"):
+                raise RuntimeError("Storage is unavailable")
+            super().setItem(key, value)
+    
+    cache = LocalStorageCache(backend=FailingStorage())
+    cache.set("a", "kept")
+    cache.set("b", "kept")
+    
+    assert not cache.set("broken", "value")
+    assert cache.get("a") == cache.get("b") == "kept"
+    assert set(LocalStorageCache(backend=cache.backend)._index) == {"a", "b"}
+
+def backed_up_storage(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    storage = TrackStorage("TestApp")
+    storage.save_track(make_track(2), "a.json")
+    storage.save_track(make_track(2), "b.json")  # Same content as a.json
+    storage.save_track(make_track(3), "c.gtrk")
+    return storage
+
+def read_snapshots(backup_dir):
+    snapshots_dir = backup_dir / "snapshots"
+    return [json.loads((snapshots_dir / name).read_text()) for name in sorted(os.listdir(snapshots_dir))]
+
+def test_backup_stores_identical_tracks_once(tmp_path, monkeypatch):
+    storage = backed_up_storage(tmp_path, monkeypatch)
+    backup_dir = tmp_path / "backup"
+    
+    success, message = storage.backup_all_tracks(str(backup_dir))
+    assert success, message
+    assert message == "Backed up 3 tracks (2 new)"
+    
+    tracks = read_snapshots(backup_dir)[0]["tracks"]
+    assert tracks["a.json"]["hash"] == tracks["b.json"]["hash"] != tracks["c.gtrk"]["hash"]
+    assert sorted(os.listdir(backup_dir / "objects")) == sorted({entry["hash"] for entry in tracks.values()})
+
+def test_repeated_backups_add_nothing_new(tmp_path, monkeypatch):
+    storage = backed_up_storage(tmp_path, monkeypatch)
+    backup_dir = tmp_path / "backup"
+    storage.backup_all_tracks(str(backup_dir))
+    objects = sorted(os.listdir(backup_dir / "objects"))
+    
+    assert storage.backup_all_tracks(str(backup_dir)) == (True, "Backed up 3 tracks (0 new)")
+    assert sorted(os.listdir(backup_dir / "objects")) == objects
+    first, second = read_snapshots(backup_dir)
+    assert first["tracks"] == second["tracks"]
+
+def test_backup_restores_every_track(tmp_path, monkeypatch):
+    storage = backed_up_storage(tmp_path, monkeypatch)
+    backup_dir = tmp_path / "backup"
+    storage.backup_all_tracks(str(backup_dir))
+    
+    # Restore the latest snapshot into a fresh storage directory
+    monkeypatch.setenv("HOME", str(tmp_path / "restored"))
+    restored = TrackStorage("TestApp")
+    for filename, entry in read_snapshots(backup_dir)[-1]["tracks"].items():
+        data = (backup_dir / "objects" / entry["hash"]).read_bytes()
+        assert len(data) == entry["size"]
+        with open(os.path.join(restored.data_dir, filename), "wb") as f:
+            f.write(data)
+    
+    assert sorted(track["name"] for track in restored.list_tracks()) == ["a.json", "b.json", "c.gtrk"]
+    for filename in ("a.json", "b.json", "c.gtrk"):
+        original = storage.load_track(filename)[1]
+        success, copy = restored.load_track(filename)
+        assert success
+        assert copy.to_dict() == original.to_dict()
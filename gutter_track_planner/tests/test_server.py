@@ -0,0 +1,70 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from server import BomService
+
+TRACK = {
+    "width": 2,
+    "depth": 2,
+    "lane_width": 6,
+    "pieces": [{"type": "straight", "x": 0, "y": 0, "rotation": 0, "length": 2}]
+}
+
+def request(service, path, payload):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    status, response = asyncio.run(service.handle("POST", path, body))
+    return status, json.loads(response)
+
+def test_identical_tracks_share_a_cache_entry():
+    service = BomService()
+    status, first = request(service, "/bom", TRACK)
+    assert status == 200 and first["status"] == "success"
+    
+    reordered = dict(reversed(list(TRACK.items())))
+    assert request(service, "/bom", reordered) == (200, first)
+    assert (service.hits, service.misses) == (1, 1)
+
+@pytest.mark.parametrize("body, status", [
+    (b"{", 400),
+    (b"[]", 400),
+    (dict(TRACK, width=2000), 400),
+    (dict(TRACK, pieces=[dict(TRACK["pieces"][0], length=3_000_000)]), 400),
+    (dict(TRACK, pieces=TRACK["pieces"] * 17), 400)
+])
+def test_bad_requests_are_turned_away_before_any_work(body, status):
+    service = BomService()
+    assert request(service, "/bom", body)[0] == status
+    assert service.misses == 0
+
+def test_each_body_is_parsed_once(monkeypatch):
+    import server
+    
+    parsed = []
+    parse = server._parse
+    monkeypatch.setattr(server, "_parse", lambda body: parsed.append(body) or parse(body))
+    
+    service = BomService()
+    reordered = dict(reversed(list(TRACK.items())))
+    for payload in (TRACK, TRACK, reordered):
+        assert request(service, "/bom", payload)[0] == 200
+    
+    # The repeat is answered from its raw body, the reordered copy by its payload hash
+    assert len(parsed) == 2
+    assert (service.hits, service.misses) == (2, 1)
+
+def test_broken_pool_is_replaced():
+    class BrokenPool(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool("A worker died")
+    
+    service = BomService()
+    service.executor = BrokenPool()
+    replacement = ThreadPoolExecutor()
+    service._new_executor = lambda: replacement
+    
+    with pytest.raises(BrokenProcessPool):
+        request(service, "/bom", TRACK)
+    assert service.executor is replacement
+    assert request(service, "/bom", TRACK)[0] == 200
@@ -0,0 +1,61 @@
+import base64
+import json
+import random
+import zlib
+import pytest
+from models import Track
+from utils import (encode_track, decode_track, generate_sharing_url, decode_sharing_url,
+                   SHARE_TOKEN_TAG, SHARE_MAX_BYTES)
+
+def sharing_track(random_track, seed):
+    rng = random.Random(seed)
+    lane_width = rng.choice([2, 3, 4.5, 6, 7.25, 12])
+    width = rng.randint(1, 12)
+    depth = rng.randint(1, 12)
+    
+    # Mostly on the grid, with some pieces at arbitrary positions
+    return random_track(
+        rng, rng.randint(0, 300), width=width, depth=depth, lane_width=lane_width,
+        attempts=1, max_length=6, off_grid=0.1
+    )
+
+def assert_same_track(copy, track):
+    assert copy.to_dict() == track.to_dict()
+    assert copy.content_hash() == track.content_hash()
+    assert sorted(copy.occupied_cells()) == sorted(track.occupied_cells())
+
+@pytest.mark.parametrize("seed", range(40))
+def test_round_trips(seed, random_track):
+    track = sharing_track(random_track, seed)
+    
+    from_json = Track.from_dict(json.loads(json.dumps(track.to_dict())))
+    assert_same_track(from_json, track)
+    
+    from_bytes = Track.from_bytes(track.to_bytes())
+    assert_same_track(from_bytes, track)
+    assert from_bytes.to_bytes() == track.to_bytes()
+    
+    assert_same_track(decode_track(encode_track(track)), track)
+    assert_same_track(decode_sharing_url(generate_sharing_url(track)), track)
+    assert_same_track(Track.from_bytes(from_json.to_bytes()), track)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_content_hash_ignores_piece_order(seed, random_track):
+    track = sharing_track(random_track, seed)
+    data = track.to_dict()
+    data["pieces"].reverse()
+    assert Track.from_dict(data).content_hash() == track.content_hash()
+    
+    if track.pieces:
+        track.remove_piece(track.pieces[-1])
+        assert Track.from_dict(data).content_hash() != track.content_hash()
+
+def test_decompression_bombs_are_rejected():
+    bomb = base64.urlsafe_b64encode(zlib.compress(bytes(SHARE_MAX_BYTES + 1), 9)).decode()
+    with pytest.raises(ValueError, match="too large"):
+        decode_track(SHARE_TOKEN_TAG + bomb.rstrip("="))
+
+def test_truncated_tokens_are_rejected(random_track):
+    token = encode_track(sharing_track(random_track, 1))
+    with pytest.raises(ValueError):
+        decode_track(token[:len(token) // 2])
@@ -0,0 +1,163 @@
+import time
+import pytest
+from models import Track, Piece, PieceType, EAST
+
+def make_track(*pieces):
+    track = Track(width=10, depth=10, lane_width=6)
+    for piece in pieces:
+        assert track.add_piece(piece)
+    return track
+
+def test_update_piece_checks_only_the_final_footprint():
+    a = Piece(PieceType.STRAIGHT, x=0, y=0, rotation=0, length=3)
+    b = Piece(PieceType.STRAIGHT, x=6, y=6, rotation=0, length=1)
+    track = make_track(a, b)
+    
+    # Moving first would overlap b; the final, shorter piece doesn't
+    assert track.update_piece(a, y=6, length=1)
+    assert track.piece_at_position(1, 1) is b
+    assert track.piece_at_position(0, 1) is a
+    assert track.free_cell_count() == track.grid_width * track.grid_height - 2
+
+def test_rejected_update_leaves_the_track_unchanged():
+    a = Piece(PieceType.STRAIGHT, x=0, y=0, rotation=0, length=3)
+    b = Piece(PieceType.STRAIGHT, x=0, y=6, rotation=0, length=1)
+    track = make_track(a, b)
+    
+    assert not track.update_piece(a, rotation=90)
+    assert a.rotation == 0
+    assert track.piece_at_position(0, 1) is b
+    assert sorted(track.occupied_cells()) == [(0, 0), (0, 1), (1, 0), (2, 0)]
+
+def test_rotate_on_a_placed_piece_is_checked():
+    a = Piece(PieceType.STRAIGHT, x=0, y=0, rotation=0, length=3)
+    b = Piece(PieceType.STRAIGHT, x=0, y=6, rotation=0, length=1)
+    track = make_track(a, b)
+    
+    assert not a.rotate(90)
+    assert not a.rotate(90)
+    assert track.piece_at_position(0, 1) is b
+    assert not track.add_piece(Piece(PieceType.STRAIGHT, x=0, y=6))
+
+def test_setting_a_field_of_a_placed_piece_is_checked():
+    a = Piece(PieceType.STRAIGHT, x=0, y=0, rotation=0, length=3)
+    b = Piece(PieceType.STRAIGHT, x=0, y=6, rotation=0, length=1)
+    track = make_track(a, b)
+    
+    with pytest.raises(ValueError):
+        a.rotation = 90
+    assert a.rotation == 0
+    
+    a.x = 12
+    assert track.piece_at_position(0, 0) is None
+    assert track.piece_at_position(4, 0) is a
+
+def test_rotate_on_an_unplaced_piece():
+    piece = Piece(PieceType.ELBOW_90, rotation=270)
+    assert piece.rotate(180)
+    assert piece.rotation == 90
+
+def test_to_dict_writes_whole_positions_as_ints():
+    track = make_track(Piece(PieceType.ELBOW_90, x=12, y=6, rotation=90))
+    data = Track.from_bytes(track.to_bytes()).to_dict()
+    
+    assert data == {
+        "width": 10,
+        "depth": 10,
+        "lane_width": 6,
+        "pieces": [{"type": "elbow_90", "x": 12, "y": 6, "rotation": 90, "length": 1}]
+    }
+    assert all(type(value) is int for value in data["pieces"][0].values() if value != "elbow_90")
+
+def test_connections_survive_removal_and_recount():
+    pieces = [Piece(PieceType.STRAIGHT, x=x * 6, y=0) for x in range(4)]
+    track = make_track(*pieces)
+    assert track.connections.summary() == {"connectors": 3, "open_ends": 2, "loops": 0, "components": 1}
+    
+    track.remove_piece(pieces[1])
+    assert track.connections.summary() == {"connectors": 1, "open_ends": 4, "loops": 0, "components": 2}
+    assert track.connections.link(pieces[2].id, 1) == (pieces[3].id, 0)
+    assert track.connections.link(pieces[0].id, 1) is None
+
+def test_dirty_cells_are_only_tracked_for_a_view():
+    track = make_track(Piece(PieceType.STRAIGHT, x=0, y=0, length=2))
+    assert track._dirty_cells is None  # Headless edits aren't collected
+    
+    # The first call can't say what changed, so everything is repainted
+    assert track.take_dirty_cells() is None
+    assert track.take_dirty_cells() == set()
+    
+    track.add_piece(Piece(PieceType.ELBOW_90, x=0, y=12))
+    assert track.take_dirty_cells() == {(0, 2), (1, 3)}
+
+def test_too_many_dirty_cells_fall_back_to_a_full_repaint(monkeypatch):
+    import models
+    monkeypatch.setattr(models, "DIRTY_CELL_LIMIT", 3)
+    track = make_track()
+    track.take_dirty_cells()
+    
+    track.add_piece(Piece(PieceType.STRAIGHT, x=0, y=0, length=4))
+    assert track.take_dirty_cells() is None
+    assert track.take_dirty_cells() == set()
+
+def test_type_change_is_checked_with_the_final_length():
+    elbow = Piece(PieceType.ELBOW_22_5, x=114, y=0)
+    track = make_track(elbow)
+    
+    # An elbow has no length; giving it one mustn't smuggle a long
+    # straight off the edge of the grid when its type changes later
+    assert track.update_piece(elbow, length=4)
+    assert elbow.length == 1
+    elbow.type = PieceType.STRAIGHT
+    assert track.update_piece(elbow, length=1)
+    assert not track.update_piece(elbow, length=2)
+    assert sorted(track.occupied_cells()) == sorted(elbow.get_occupied_cells(6)) == [(19, 0)]
+
+def test_values_the_store_cannot_hold_leave_it_untouched():
+    a = Piece(PieceType.STRAIGHT, x=0, y=0, rotation=0, length=2)
+    track = make_track(a)
+    before = track.to_dict()
+    
+    # A negative length fits no column; the row must not be half appended
+    assert not track.add_piece(Piece(PieceType.STRAIGHT, x=6, y=6, rotation=0, length=-3))
+    with pytest.raises(ValueError):
+        track.store.add(PieceType.STRAIGHT, 6, 6, 0, -3)
+    with pytest.raises(ValueError):
+        track.store.update(a.id, {"length": 70000})
+    
+    assert track.to_dict() == before
+    assert track.piece_at_position(1, 0) is a
+    assert track.materials.snapshot() == Track.from_dict(before).materials.snapshot()
+    
+    # Any angle is kept modulo a full turn
+    assert track.update_piece(a, rotation=36000)
+    assert a.rotation == 0
+
+def test_auto_route_joins_two_cells_through_free_space():
+    track = Track(width=10, depth=10, lane_width=6)
+    assert track.add_piece(Piece(PieceType.STRAIGHT, x=30, y=0, rotation=90, length=15))
+    
+    route = track.auto_route((0, 0), (12, 0), start_heading=EAST, end_heading=EAST)
+    assert route
+    for piece in route:
+        assert track.add_piece(piece)
+    assert track.piece_at_position(0, 0) is route[0]
+    assert track.piece_at_position(12, 0) is route[-1]
+
+def test_auto_route_gives_up_on_an_unreachable_or_blocked_end():
+    track = Track(width=80, depth=40, lane_width=6)
+    wall = [
+        Piece(PieceType.STRAIGHT, x=54, y=54, rotation=0, length=3),
+        Piece(PieceType.STRAIGHT, x=54, y=66, rotation=0, length=3),
+        Piece(PieceType.STRAIGHT, x=54, y=60, rotation=0, length=1),
+        Piece(PieceType.STRAIGHT, x=66, y=60, rotation=0, length=1)
+    ]
+    for piece in wall:
+        assert track.add_piece(piece)
+    
+    # The walled-in cell is free but can't be reached
+    assert track.auto_route((0, 0), (10, 10)) is None
+    
+    started = time.perf_counter()
+    assert track.auto_route((0, 0), (9, 9), max_expansions=10 ** 9, time_budget=None) is None
+    assert time.perf_counter() - started < 0.05
@@ -0,0 +1,56 @@
+import json
+import api
+from api import BomCalculator
+from models import footprint
+
+TRACK = {
+    "width": 2,
+    "depth": 2,
+    "lane_width": 6,
+    "pieces": [
+        {"type": "straight", "x": 0, "y": 0, "rotation": 0, "length": 2},
+        {"type": "elbow_90", "x": 6, "y": 0, "rotation": 90, "length": 1},    # Overlaps
+        {"type": "straight", "x": 18, "y": 0, "rotation": 0, "length": 2},    # Off the grid
+        {"type": "straight", "x": 0, "y": 6, "rotation": [90], "length": 1},
+        {"type": "tee", "x": 0, "y": 12, "rotation": 0, "length": 1}
+    ]
+}
+
+def test_unhashable_rotation_is_reported():
+    result = BomCalculator.validate_track(TRACK)
+    assert result["status"] == "success"
+    assert "Piece 4: Invalid rotation: [90]" in result["errors"]
+
+def test_validate_file_matches_validate_track_whatever_the_key_order(tmp_path):
+    expected = BomCalculator.validate_track(TRACK)
+    assert expected["error_count"] == 4
+    
+    for sort_keys in (False, True):
+        path = tmp_path / f"track_{sort_keys}.json"
+        path.write_text(json.dumps(TRACK, sort_keys=sort_keys))
+        result = BomCalculator.validate_file(path)
+        assert sorted(result["errors"]) == sorted(expected["errors"])
+        assert result["pieces"] == 5
+
+def test_straights_longer_than_the_board_are_refused_before_their_cells_are_built(tmp_path, monkeypatch):
+    track = dict(TRACK, pieces=TRACK["pieces"] + [
+        {"type": "straight", "x": 0, "y": 0, "rotation": 90, "length": 3_000_000}
+    ])
+    lengths = []
+    
+    def recording_footprint(piece_type, rotation, length):
+        lengths.append(length)
+        return footprint(piece_type, rotation, length)
+    
+    monkeypatch.setattr(api, "footprint", recording_footprint)
+    expected = BomCalculator.validate_track(track)
+    assert "Piece 6: Length 3000000 is longer than the board" in expected["errors"]
+    
+    # Pieces before the dimensions are bounded once the dimensions turn up
+    for sort_keys in (False, True):
+        path = tmp_path / f"track_{sort_keys}.json"
+        path.write_text(json.dumps(track, sort_keys=sort_keys))
+        result = BomCalculator.validate_file(path)
+        assert sorted(result["errors"]) == sorted(expected["errors"])
+    
+    assert max(lengths) <= 4